@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Group Commit Check for Mneme
+Concurrent saves through the server's writer threads must share one flush
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from memory_io import StoreExecutor  # noqa: E402
+from memory_store import MemoryStore  # noqa: E402
+
+
+def run(durability: str, args) -> list:
+    """Save `args.saves` memories at once; problems found (empty if they shared one flush)"""
+    data_dir = Path(tempfile.mkdtemp(prefix="mneme_group_"))
+    store = MemoryStore(
+        data_dir,
+        journal_mode=args.journal_mode,
+        durability=durability,
+        group_commit_window=args.window_ms / 1000,
+    )
+    io = StoreExecutor(store)
+
+    # Same shape as link_claude_conversation: mutate under the lock, commit outside it
+    @io.writer
+    def save(n: int) -> bool:
+        memory_id = f"group_{n}"
+        with io.lock:
+            store.put({
+                "id": memory_id,
+                "type": "conversation",
+                "content": {"summary": f"save {n}"},
+                "metadata": {"source": "Claude Conversation", "access_count": 0},
+            })
+            store.index_add("topics", "group commit", memory_id)
+        return store.commit()
+
+    async def save_all():
+        return await asyncio.gather(*(save(n) for n in range(args.saves)))
+
+    started = time.perf_counter()
+    results = asyncio.run(save_all())
+    elapsed = time.perf_counter() - started
+    io.shutdown()
+    store.flush()
+
+    problems = []
+    if not all(results):
+        problems.append(f"{results.count(False)} commits failed")
+    if store.committer.flush_count != 1:
+        problems.append(f"{store.committer.flush_count} flushes, expected 1")
+    reloaded = MemoryStore(data_dir, journal_mode=args.journal_mode)
+    missing = [n for n in range(args.saves) if f"group_{n}" not in reloaded]
+    if missing:
+        problems.append(f"{len(missing)} saves lost")
+    print(f"{durability}: {args.saves} saves, {store.committer.flush_count} flushes, "
+          f"{elapsed * 1000:.0f} ms ({args.journal_mode} journal, {args.window_ms:g} ms window)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument("--saves", type=int, default=8,
+                        help="concurrent saves (at most the writer pool size share a group)")
+    parser.add_argument("--window-ms", type=float, default=100.0, help="group commit window")
+    parser.add_argument("--journal-mode", choices=["off", "wal"], default="off")
+    args = parser.parse_args()
+
+    problems = []
+    for durability in ("strict", "relaxed"):
+        problems += [f"{durability}: {problem}" for problem in run(durability, args)]
+    for problem in problems:
+        print(f"  FAIL: {problem}")
+    if not problems:
+        print("  OK: concurrent saves shared one flush")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Sampler Check for Mneme
+Fenwick trees built in O(n) must hold the same prefix sums as ones built by add()
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from memory_sampling import FenwickTree  # noqa: E402
+
+
+def prefix_sums(tree: FenwickTree) -> list:
+    """Sum of the first n values, for every n"""
+    sums = []
+    for n in range(len(tree) + 1):
+        total, i = 0.0, n
+        while i > 0:
+            total += tree.tree[i]
+            i -= i & -i
+        sums.append(total)
+    return sums
+
+
+def check(values: list, capacity: int) -> bool:
+    built = FenwickTree.build(values, capacity)
+    added = FenwickTree(capacity)
+    for position, value in enumerate(values):
+        added.add(position, value)
+    return all(
+        abs(x - y) <= 1e-9 * max(1.0, abs(y))
+        for x, y in zip(prefix_sums(built), prefix_sums(added))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument("--trials", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failures = 0
+    for _ in range(args.trials):
+        size = rng.randrange(0, 300)
+        # Spare capacity past the last value is where partial sums used to get lost
+        capacity = size + rng.randrange(0, 300)
+        values = [rng.uniform(0, 1000) for _ in range(size)]
+        if not check(values, capacity):
+            failures += 1
+            if failures <= 3:
+                print(f"  FAIL: {size} values in capacity {capacity}")
+    print(f"{args.trials} trees checked")
+    if not failures:
+        print("  OK: built prefix sums match repeated add()")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
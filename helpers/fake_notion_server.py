@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Fake Notion API Server for Mneme
+Serves generated pages for any database ID so the backfill can run offline
+"""
+
+import argparse
+import json
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+QUERY_PATH = re.compile(r"^/v1/databases/([^/]+)/query$")
+CHILDREN_PATH = re.compile(r"^/v1/blocks/([^/]+)/children$")
+EPOCH = datetime(2014, 1, 1, tzinfo=timezone.utc)
+EDITED = EPOCH + timedelta(days=5000)
+
+
+def rich_text(text):
+    return [{"type": "text", "plain_text": text, "text": {"content": text}}]
+
+
+def iso(moment):
+    return moment.isoformat().replace("+00:00", "Z")
+
+
+def make_page(database_id, number, edited=False):
+    """Page `number`; edited pages have a later last_edited_time and a new title"""
+    created = EPOCH + timedelta(days=number)
+    page_id = f"{database_id}-{number:05d}"
+    title = f"{database_id} page {number}" + (" (edited)" if edited else "")
+    return {
+        "object": "page",
+        "id": page_id,
+        "created_time": iso(created),
+        "last_edited_time": iso(EDITED + timedelta(minutes=number) if edited else created),
+        "url": f"https://www.notion.so/{page_id}",
+        "archived": False,
+        "properties": {
+            "Name": {"type": "title", "title": rich_text(title)},
+            "Tags": {"type": "multi_select", "multi_select": [{"name": f"tag{number % 5}"}]},
+        },
+    }
+
+
+def make_blocks(block_id):
+    """Pages have a paragraph and a toggle with one nested paragraph"""
+    if block_id.endswith("-toggle"):
+        return [{"object": "block", "id": f"{block_id}-inner", "type": "paragraph",
+                 "has_children": False, "paragraph": {"rich_text": rich_text(f"Inside {block_id}")}}]
+    return [
+        {"object": "block", "id": f"{block_id}-p", "type": "paragraph", "has_children": False,
+         "paragraph": {"rich_text": rich_text(f"Body of {block_id}")}},
+        {"object": "block", "id": f"{block_id}-toggle", "type": "toggle", "has_children": True,
+         "toggle": {"rich_text": rich_text("More")}},
+    ]
+
+
+class FakeNotion:
+    """Request counters and failure injection shared by the handler threads"""
+
+    def __init__(self, pages_per_database, fail_every, edited=0):
+        self.pages_per_database = pages_per_database
+        self.fail_every = fail_every
+        self.edited = edited
+        self.requests = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def should_fail(self):
+        with self.lock:
+            self.requests += 1
+            if self.fail_every and self.requests % self.fail_every == 0:
+                self.failures += 1
+                return True
+            return False
+
+    def query(self, database_id, body):
+        """Pages matching the query's last_edited_time filter, sorted as asked"""
+        pages = [
+            make_page(database_id, number, edited=number < self.edited)
+            for number in range(self.pages_per_database)
+        ]
+        since = (body.get("filter") or {}).get("last_edited_time", {}).get("on_or_after")
+        if since:
+            pages = [page for page in pages if page["last_edited_time"] >= since]
+        for sort in reversed(body.get("sorts") or []):
+            pages.sort(key=lambda page: page[sort["timestamp"]],
+                       reverse=sort.get("direction") == "descending")
+        return pages
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "FakeNotion/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _rate_limited(self):
+        if self.server.fake.should_fail():
+            self._send(429, {"object": "error", "status": 429, "code": "rate_limited",
+                             "message": "Rate limited"}, {"Retry-After": "0"})
+            return True
+        return False
+
+    def do_POST(self):
+        match = QUERY_PATH.match(urlparse(self.path).path)
+        if not match:
+            return self._send(404, {"object": "error", "status": 404, "code": "object_not_found",
+                                    "message": "Not found"})
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self._rate_limited():
+            return
+        pages = self.server.fake.query(match.group(1), body)
+        start = int(body.get("start_cursor") or 0)
+        size = min(int(body.get("page_size") or 100), 100)
+        end = min(start + size, len(pages))
+        has_more = end < len(pages)
+        self._send(200, {
+            "object": "list",
+            "results": pages[start:end],
+            "has_more": has_more,
+            "next_cursor": str(end) if has_more else None,
+        })
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        match = CHILDREN_PATH.match(url.path)
+        if not match:
+            return self._send(404, {"object": "error", "status": 404, "code": "object_not_found",
+                                    "message": "Not found"})
+        if self._rate_limited():
+            return
+        self._send(200, {"object": "list", "results": make_blocks(match.group(1)),
+                         "has_more": False, "next_cursor": None})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=250, help="pages per database")
+    parser.add_argument("--fail-every", type=int, default=0,
+                        help="answer every Nth request with 429 (0: never)")
+    parser.add_argument("--edited", type=int, default=0,
+                        help="serve the first N pages of each database as edited since the backfill")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), Handler)
+    server.fake = FakeNotion(args.pages, args.fail_every, args.edited)
+    print(f"Fake Notion API on http://127.0.0.1:{args.port} ({args.pages} pages per database)")
+    print(f"Run the backfill with NOTION_BASE_URL=http://127.0.0.1:{args.port} NOTION_API_KEY=fake")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Served {server.fake.requests} requests ({server.fake.failures} rate limited)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Concurrent Writer Stress Test for Mneme
+Several processes save into one data directory; verifies that no write is lost
+"""
+
+import argparse
+import multiprocessing
+import sys
+import tempfile
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from memory_store import MemoryStore  # noqa: E402
+
+SHARED_ID = "stress_shared"
+
+
+def open_store(args):
+    return MemoryStore(
+        args.data_dir,
+        journal_mode=args.journal_mode,
+        layout=args.layout,
+        group_commit_window=args.window_ms / 1000,
+    )
+
+
+def writer(worker: int, args, start):
+    """Save `args.writes` memories, bumping the shared memory's access count after each"""
+    store = open_store(args)
+    start.wait()
+    for n in range(args.writes):
+        store.refresh()
+        memory_id = f"stress_{worker}_{n}"
+        store.put({
+            "id": memory_id,
+            "type": "notion_import",
+            "content": {"original": f"worker {worker} write {n}", "title": memory_id},
+            "metadata": {"source": "Notion:stress", "tags": [f"worker{worker}"], "access_count": 0},
+        })
+        store.index_add("notion_imports", "stress", memory_id)
+        store.bump_access(SHARED_ID)
+        if not store.commit():
+            raise RuntimeError(f"worker {worker}: commit {n} failed")
+
+
+def check(args) -> list:
+    """Problems found in the final store (empty if every write survived)"""
+    store = open_store(args)
+    expected = {
+        f"stress_{worker}_{n}"
+        for worker in range(args.processes) for n in range(args.writes)
+    }
+    problems = []
+    missing = expected - set(store.memories)
+    if missing:
+        problems.append(f"{len(missing)} memories lost, e.g. {sorted(missing)[:3]}")
+    indexed = store.index_section("notion_imports").get("stress", [])
+    if len(indexed) != len(set(indexed)):
+        problems.append("duplicate index entries")
+    if set(indexed) != expected:
+        problems.append(f"{len(expected - set(indexed))} index entries lost")
+    count = store.memories[SHARED_ID]["metadata"]["access_count"]
+    if count != len(expected):
+        problems.append(f"shared access_count is {count}, expected {len(expected)}")
+    if args.layout == "split":
+        for memory_id in expected - missing:
+            memory = store.get(memory_id)
+            if memory["content"]["title"] != memory_id:
+                problems.append(f"{memory_id} points at another memory's body")
+                break
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--writes", type=int, default=50, help="saves per process")
+    parser.add_argument("--journal-mode", choices=["off", "wal"], default="off")
+    parser.add_argument("--layout", choices=["inline", "split"], default="inline")
+    parser.add_argument("--window-ms", type=float, default=0.0, help="group commit window")
+    parser.add_argument("--data-dir", help="store to use (default: a fresh temp dir)")
+    args = parser.parse_args()
+    args.data_dir = Path(args.data_dir or tempfile.mkdtemp(prefix="mneme_stress_"))
+
+    seed = open_store(args)
+    seed.put({
+        "id": SHARED_ID, "type": "conversation",
+        "content": {"summary": "bumped by every writer"},
+        "metadata": {"access_count": 0},
+    })
+    seed.commit()
+
+    start = multiprocessing.Event()
+    workers = [
+        multiprocessing.Process(target=writer, args=(worker, args, start))
+        for worker in range(args.processes)
+    ]
+    for process in workers:
+        process.start()
+    start.set()
+    for process in workers:
+        process.join()
+
+    failed = [process.exitcode for process in workers if process.exitcode != 0]
+    problems = check(args)
+    if failed:
+        problems.insert(0, f"{len(failed)} writer processes failed")
+    print(f"{args.processes} processes x {args.writes} writes "
+          f"({args.journal_mode} journal, {args.layout} layout) in {args.data_dir}")
+    for problem in problems:
+        print(f"  FAIL: {problem}")
+    if not problems:
+        print("  OK: no lost writes")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,13 +5,21 @@ Works in conjunction with Claude's native Notion integration
 """
 
 import os
+import sys
 import json
 import random
+import asyncio
+import functools
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import List, Dict, Optional, Any
 from fastmcp import FastMCP
 
+# Locking and atomic writes are shared with the servers in src/ (or with
+# their modules copied alongside this file)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from memory_persistence import StoreLock, write_file_atomic  # noqa: E402
+
 # Data storage directory
 DATA_DIR = Path.home() / ".mneme_memory"
 DATA_DIR.mkdir(exist_ok=True)
@@ -19,6 +27,10 @@ MEMORIES_FILE = DATA_DIR / "memories.json"
 INDEX_FILE = DATA_DIR / "index.json"
 SERENDIPITY_FILE = DATA_DIR / "serendipity_cache.json"
 
+# Shared with the other Mneme servers: advisory lock and store version counter
+store_lock = StoreLock(DATA_DIR / ".mneme.lock")
+tool_lock = asyncio.Lock()
+
 # Server initialization
 mcp = FastMCP("Mneme - Personal Memory Lighthouse")
 
@@ -36,12 +48,44 @@ def load_json(file_path):
 
 
 def save_json(file_path, data):
-    """Save to JSON file"""
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """Save to JSON file (readers see either the old or the new content)"""
+    write_file_atomic(file_path, json.dumps(data, ensure_ascii=False, indent=2))
+
+
+def store_locked(bump: bool = True):
+    """
+    Run a tool's read-modify-write of the data files under the exclusive
+    store lock shared with the other Mneme servers (flock, or msvcrt on
+    Windows), then bump the store version so they reload before their
+    next write. The lock is awaited on a worker thread, so the event loop
+    keeps serving while another process holds it.
+    """
+    def decorator(tool):
+        @functools.wraps(tool)
+        async def wrapper(*args, **kwargs):
+            # StoreLock holds only count within a process, so tools take turns
+            async with tool_lock:
+                acquiring = asyncio.ensure_future(asyncio.to_thread(store_lock.acquire, True))
+                try:
+                    await asyncio.shield(acquiring)
+                except asyncio.CancelledError:
+                    # The thread still takes the lock; hand it back before giving up
+                    await acquiring
+                    store_lock.release()
+                    raise
+                try:
+                    result = await tool(*args, **kwargs)
+                    if bump:
+                        store_lock.bump()
+                    return result
+                finally:
+                    store_lock.release()
+        return wrapper
+    return decorator
 
 
 @mcp.tool()
+@store_locked()
 async def save_from_notion(
     content: str,
     title: str,
@@ -156,6 +200,7 @@ async def get_daily_inspiration_prompt() -> Dict:
 
 
 @mcp.tool()
+@store_locked(bump=False)
 async def cache_serendipity(
     discoveries: List[Dict[str, str]]
 ) -> Dict:
@@ -184,6 +229,7 @@ async def cache_serendipity(
 
 
 @mcp.tool()
+@store_locked()
 async def get_random_memory(memory_type: Optional[str] = None) -> Dict:
     """
     Retrieve a random memory with aging bias (older memories more likely)
@@ -235,6 +281,7 @@ async def get_random_memory(memory_type: Optional[str] = None) -> Dict:
 
 
 @mcp.tool()
+@store_locked()
 async def link_claude_conversation(
     summary: str,
     key_insights: List[str],
@@ -7,10 +7,10 @@ Works in conjunction with Claude's native Notion integration
 import os
 import sys
 import json
-import random
+import atexit
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import Callable, List, Dict, Optional, Any, Tuple
 
 try:
     from fastmcp import FastMCP
@@ -18,46 +18,438 @@ except ImportError:
     print("Error: fastmcp package not found. Please install it with: pip install fastmcp")
     sys.exit(1)
 
+from memory_cache import SerendipityCache
+from memory_columns import source_db as memory_source_db
+from memory_dates import DateIndex
+from memory_dedup import DuplicateIndex
+from memory_fingerprints import content_hash, notion_page_key
+from memory_ids import new_memory_id
+from memory_io import StoreExecutor
+from memory_sampling import AgingSampler
+from memory_search import InvertedIndex
+from memory_stats import MemoryStats
+from memory_store import MemoryStore
+from memory_time import MS_PER_DAY, ms_isoformat, parse_timestamp
+from memory_vectors import VectorIndex, vector_search_available
+from sqlite_store import SQLiteMemoryStore, migrate_json_to_sqlite
+
 # Data storage directory
 DATA_DIR = Path.home() / ".mneme_memory"
 DATA_DIR.mkdir(exist_ok=True)
 MEMORIES_FILE = DATA_DIR / "memories.json"
 INDEX_FILE = DATA_DIR / "index.json"
-SERENDIPITY_FILE = DATA_DIR / "serendipity_cache.json"
+SERENDIPITY_FILE = DATA_DIR / "serendipity_cache.json"  # legacy, imported once
+SERENDIPITY_LOG = DATA_DIR / "serendipity_cache.jsonl"
 
 # Server initialization
 mcp = FastMCP("Mneme - Personal Memory Lighthouse")
 
 # File initialization
-for file_path in [MEMORIES_FILE, INDEX_FILE, SERENDIPITY_FILE]:
+for file_path in [MEMORIES_FILE, INDEX_FILE]:
     if not file_path.exists():
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump({}, f)
 
 
-def load_json(file_path):
-    """Load JSON file with error handling"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data if isinstance(data, dict) else {}
-    except (json.JSONDecodeError, FileNotFoundError):
-        return {}
+def open_store():
+    """Open the storage backend selected by MNEME_STORAGE_BACKEND (json/sqlite)"""
+    backend = os.environ.get("MNEME_STORAGE_BACKEND", "json")
+    if backend == "sqlite":
+        db_path = DATA_DIR / "memories.db"
+        if not db_path.exists():
+            migrate_json_to_sqlite(DATA_DIR, db_path)
+        return SQLiteMemoryStore(db_path)
+    if backend != "json":
+        raise ValueError(f"Unknown storage backend: {backend}")
+    # Resident memory store (loaded once, reloaded only on external changes)
+    # MNEME_JOURNAL_MODE=wal appends mutations to memories.wal instead of
+    # rewriting memories.json on every save; saves arriving within
+    # MNEME_GROUP_COMMIT_MS share one write; MNEME_STORAGE_LAYOUT=split keeps
+    # only metadata resident and reads content lazily, keeping at most
+    # MAX_MEMORIES_IN_MEMORY bodies (and MNEME_BODY_CACHE_MB) cached
+    return MemoryStore(
+        DATA_DIR,
+        journal_mode=os.environ.get("MNEME_JOURNAL_MODE", "off"),
+        durability=os.environ.get("MNEME_DURABILITY", "strict"),
+        group_commit_window=float(os.environ.get("MNEME_GROUP_COMMIT_MS", "0")) / 1000,
+        layout=os.environ.get("MNEME_STORAGE_LAYOUT", "inline"),
+        body_cache_size=int(os.environ.get("MAX_MEMORIES_IN_MEMORY", "1000")),
+        body_cache_bytes=int(float(os.environ.get("MNEME_BODY_CACHE_MB", "0")) * 1024 * 1024)
+    )
 
 
-def save_json(file_path, data):
-    """Save to JSON file with error handling"""
-    try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        print(f"Error saving JSON to {file_path}: {e}")
-        return False
+store = open_store()
+
+# Inverted index for search_by_context, kept current on every save and
+# persisted at shutdown so the next start can skip re-tokenizing
+search_index = InvertedIndex(persist_path=DATA_DIR / "search_index.json")
+store.add_listener(search_index)
+
+# Aging-biased sampler for get_random_memory (O(log n) draws)
+sampler = AgingSampler(columns=store.columns)
+store.add_listener(sampler)
+
+# Date index so get_daily_inspiration_prompt can answer from local memories
+dates = DateIndex(columns=store.columns)
+store.add_listener(dates)
+
+# Serendipity cache: CACHE_EXPIRY_HOURS TTL, LRU-bounded to
+# MNEME_SERENDIPITY_CACHE_SIZE keys
+serendipity = SerendipityCache(
+    SERENDIPITY_LOG,
+    ttl_hours=float(os.environ.get("CACHE_EXPIRY_HOURS", "24")),
+    max_entries=int(os.environ.get("MNEME_SERENDIPITY_CACHE_SIZE", "100")),
+    legacy_path=SERENDIPITY_FILE
+)
+
+# Running statistics for get_memory_stats, persisted like the search index
+stats = MemoryStats(persist_path=DATA_DIR / "memory_stats.json", columns=store.columns)
+store.add_listener(stats)
+
+# MinHash/LSH index of near-duplicates (estimated similarity of at least
+# MNEME_DUPLICATE_THRESHOLD), signed once per save and persisted like
+# the search index
+duplicates = DuplicateIndex(
+    threshold=float(os.environ.get("MNEME_DUPLICATE_THRESHOLD", "0.7")),
+    persist_path=DATA_DIR / "duplicate_index.json"
+)
+store.add_listener(duplicates)
+
+# Hashed TF-IDF vectors (MNEME_VECTOR_DIM wide) for semantic search, in
+# the column slots of the store; weighted by the search index, so it is
+# registered after it. Needs NumPy, otherwise only keyword search works
+vectors = None
+if vector_search_available():
+    vectors = VectorIndex(
+        store.columns, search_index,
+        dim=int(os.environ.get("MNEME_VECTOR_DIM", "256")),
+        persist_path=DATA_DIR / "vector_index.json"
+    )
+    store.add_listener(vectors)
+
+# Tool bodies run on I/O threads: writers take turns applying mutations, reads
+# never wait for a commit to reach disk
+io = StoreExecutor(store)
+
+# Most memories get_random_memories returns in one call (each draw holds
+# the state lock and returns full content)
+MAX_RANDOM_MEMORIES = 50
+
+# Draws tried per requested memory when sampling with near-duplicates
+# collapsed, and the factor by which search widens its candidate list
+COLLAPSE_ATTEMPTS = 16
+COLLAPSE_OVERFETCH = 4
+
+# index.json sections kept next to notion_imports: Notion page key ->
+# memory ID (for updates in place), page key -> content hash of the last
+# save (to skip unchanged pages) and per-database sync checkpoints
+NOTION_PAGES_SECTION = "notion_pages"
+NOTION_HASHES_SECTION = "notion_hashes"
+NOTION_SYNC_SECTION = "notion_sync"
+
+
+def shutdown():
+    """Drain queued writes, flush pending commits and persist derived indexes"""
+    io.shutdown()
+    if isinstance(store, MemoryStore):
+        store.flush()
+    else:
+        store.commit()
+    search_index.persist(store.signature())
+    duplicates.persist(store.signature())
+    if vectors is not None:
+        vectors.persist(store.signature())
+    stats.persist(store.signature())
+
+
+atexit.register(shutdown)
+
+
+def index_notion_pages():
+    """
+    Map Notion imports saved before page keys were indexed to their pages
+
+    Runs while the notion_pages section is empty, reading metadata only.
+    Those memories have no content hash yet, so their next save updates
+    them in place once instead of adding a copy.
+    """
+    if store.index_key_count(NOTION_PAGES_SECTION):
+        return
+    with io.lock:
+        for memory_id, record in store.metadata_items("notion_import"):
+            metadata = record.get("metadata", {})
+            page_key = notion_page_key(metadata.get("notion_page_id"), metadata.get("notion_url"))
+            if page_key:
+                store.index_add(NOTION_PAGES_SECTION, page_key, memory_id)
+    store.commit()
+
+
+index_notion_pages()
+
+
+def notion_summary(content: str) -> str:
+    return content[:200] + "..." if len(content) > 200 else content
+
+
+def find_notion_memory(page_key: str) -> Optional[Dict]:
+    """Memory previously saved from a Notion page, if any"""
+    for memory_id in store.index_lookup(NOTION_PAGES_SECTION, page_key):
+        memory = store.get(memory_id)
+        if memory is not None:
+            return memory
+    return None
+
+
+def unchanged_notion_memory(page_key: str, digest: str) -> Optional[str]:
+    """ID of the memory saved from a page if it was saved with this content hash"""
+    if store.index_get(NOTION_HASHES_SECTION, page_key) != digest:
+        return None
+    for memory_id in store.index_lookup(NOTION_PAGES_SECTION, page_key):
+        if memory_id in store:
+            return memory_id
+    return None
+
+
+def stage_notion_memory(
+    content: str,
+    title: str,
+    source_db: str,
+    notion_url: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    created: Optional[datetime] = None,
+    page_id: Optional[str] = None,
+    last_edited_time: Optional[str] = None
+) -> Tuple[str, str]:
+    """
+    Build a notion_import memory and stage it (plus index entries) in the store
+
+    `created` dates the memory (e.g. the page's creation time when
+    backfilling); it defaults to now. Pages are keyed by `page_id`, else
+    by the ID in `notion_url`: a page saved before with the same content
+    hash is skipped without reading it, one whose content changed is
+    updated in place and keeps its ID, creation time, importance and
+    access count. Returns (memory ID, "created"/"updated"/"unchanged").
+    """
+    page_key = notion_page_key(page_id, notion_url)
+    digest = content_hash(title, content, source_db, tags)
+    if page_key:
+        unchanged = unchanged_notion_memory(page_key, digest)
+        if unchanged is not None:
+            return unchanged, "unchanged"
+    existing = find_notion_memory(page_key) if page_key else None
+    if existing is not None:
+        memory_id = existing["id"]
+        metadata = dict(existing.get("metadata", {}))
+        old_tags = metadata.get("tags") or []
+        old_source = memory_source_db(existing)
+    else:
+        # Generate a time-sortable, collision-free memory ID (dated by
+        # the page's creation time when the backfill provides it)
+        memory_id = new_memory_id("notion", created)
+        now = created or datetime.now(timezone.utc)
+        metadata = {"timestamp": now.isoformat()}
+        old_tags = []
+        old_source = None
+    metadata.update({
+        "source": f"Notion:{source_db}",
+        "notion_url": notion_url,
+        "tags": tags or [],
+    })
+    metadata.setdefault("importance", 0.7)
+    metadata.setdefault("access_count", 0)
+    metadata["content_hash"] = digest
+    if page_id:
+        metadata["notion_page_id"] = page_id
+    if last_edited_time:
+        metadata["last_edited_time"] = last_edited_time
+    
+    # Create memory structure
+    memory = {
+        "id": memory_id,
+        "type": "notion_import",
+        "content": {
+            "original": content,
+            "title": title,
+            "summary": notion_summary(content)
+        },
+        "metadata": metadata
+    }
+    
+    # Save memory and update notion/tag indexes
+    store.put(memory)
+    if old_source != source_db:
+        if old_source is not None:
+            store.index_remove("notion_imports", old_source, memory_id)
+        store.index_add("notion_imports", source_db, memory_id)
+    if page_key:
+        if existing is None:
+            store.index_add(NOTION_PAGES_SECTION, page_key, memory_id)
+        store.index_set(NOTION_HASHES_SECTION, page_key, digest)
+    for tag in old_tags:
+        if tag not in metadata["tags"]:
+            store.index_remove("tags", tag, memory_id)
+    for tag in metadata["tags"]:
+        if tag not in old_tags:
+            store.index_add("tags", tag, memory_id)
+    return memory_id, "updated" if existing is not None else "created"
+
+
+def near_duplicate_report(memory_id: str) -> List[Dict]:
+    """Near-duplicates of a memory, closest first, for save results"""
+    return [
+        {"memory_id": other, "similarity": round(score, 3)}
+        for other, score in duplicates.near_duplicates(memory_id)
+    ]
+
+
+def draw_collapsed(draw: Callable[[int], List[Tuple[str, int]]], count: int,
+                   without_replacement: bool = True) -> List[Tuple[str, int]]:
+    """
+    Sampler draws with near-duplicates collapsed
+
+    `draw(n)` returns n (memory_id, days_old) draws. A memory with k
+    near-copies is kept with probability 1/(k + 1), so a group of copies
+    comes up about as often as a single memory, and never next to a
+    near-copy of a memory already picked.
+    """
+    picks: List[Tuple[str, int]] = []
+    drawn: List[Tuple[str, int]] = []
+    for _ in range(COLLAPSE_ATTEMPTS):
+        if len(picks) >= count:
+            break
+        drawn = draw(count - len(picks))
+        if not drawn:
+            break
+        for memory_id, days_old in drawn:
+            if len(picks) >= count:
+                break
+            picked = {picked_id for picked_id, _ in picks}
+            if without_replacement and memory_id in picked:
+                continue
+            near = {other for other, _ in duplicates.near_duplicates(memory_id)}
+            if near & picked:
+                continue
+            if near and sampler.rng.random() * (len(near) + 1) >= 1:
+                continue
+            picks.append((memory_id, days_old))
+    if not picks and drawn:
+        # Only copies of each other left: return one rather than nothing
+        picks = drawn[:1]
+    return picks
+
+
+def record_access(memory_ids: List[str]):
+    """Bump access counts and commit (queued on the writer by the read tools)"""
+    with io.lock:
+        for memory_id in memory_ids:
+            if memory_id in store:
+                store.bump_access(memory_id)
+    store.commit()
+
+
+def with_access_recorded(memory: Dict) -> Dict:
+    """Copy of a memory as it reads once its queued access bump is applied"""
+    metadata = dict(memory.get("metadata", {}))
+    metadata["access_count"] = metadata.get("access_count", 0) + 1
+    return {**memory, "metadata": metadata}
+
+
+def validate_notion_page(page: Any) -> Optional[str]:
+    """Return an error message if a save_many_from_notion item is malformed"""
+    if not isinstance(page, dict):
+        return "Page must be an object"
+    for field in ("content", "title", "source_db"):
+        if not isinstance(page.get(field), str) or not page[field].strip():
+            return f"Missing or empty '{field}'"
+    if page.get("notion_url") is not None and not isinstance(page["notion_url"], str):
+        return "'notion_url' must be a string"
+    tags = page.get("tags")
+    if tags is not None and not (isinstance(tags, list) and all(isinstance(t, str) for t in tags)):
+        return "'tags' must be a list of strings"
+    for field in ("created_time", "last_edited_time"):
+        if page.get(field) is not None and parse_timestamp(page[field]) is None:
+            return f"'{field}' must be an ISO 8601 timestamp"
+    if page.get("notion_page_id") is not None and not isinstance(page["notion_page_id"], str):
+        return "'notion_page_id' must be a string"
+    return None
+
+
+def save_notion_pages(pages: List[Dict[str, Any]],
+                      checkpoints: Optional[Dict[str, Dict]] = None) -> Dict:
+    """
+    Validate, stage and commit a batch of Notion pages (see
+    save_many_from_notion); also the sink of the Notion backfill
+
+    Pages saved before (same notion_page_id or notion_url) are skipped if
+    their content is unchanged and updated in place otherwise; the result
+    counts them as written_count and skipped_count. `checkpoints`
+    (database name -> sync state) are stored in the notion_sync section
+    of the index with the same commit, so a checkpoint never runs ahead
+    of the pages it covers. The whole batch is staged under one hold of
+    io.lock, so reads see all of it or none of it, as with a single save.
+    Run it on the writer (io.writer or io.submit_write), which refreshes
+    the store first.
+    """
+    results = []
+    valid = []
+    for position, page in enumerate(pages):
+        error = validate_notion_page(page)
+        if error:
+            results.append({"index": position, "success": False, "message": error})
+        else:
+            valid.append((position, page))
+    
+    with io.lock:
+        for position, page in valid:
+            memory_id, status = stage_notion_memory(
+                page["content"],
+                page["title"],
+                page["source_db"],
+                page.get("notion_url"),
+                page.get("tags"),
+                parse_timestamp(page.get("created_time")),
+                page.get("notion_page_id"),
+                page.get("last_edited_time")
+            )
+            result = {
+                "index": position,
+                "success": True,
+                "memory_id": memory_id,
+                "title": page["title"],
+                "status": status
+            }
+            if status != "unchanged":
+                near = near_duplicate_report(memory_id)
+                if near:
+                    result["near_duplicates"] = near
+            results.append(result)
+        for source_db, state in (checkpoints or {}).items():
+            store.index_set(NOTION_SYNC_SECTION, source_db, state)
+    results.sort(key=lambda result: result["index"])
+    
+    saved = sum(1 for result in results if result["success"])
+    skipped = sum(1 for result in results if result.get("status") == "unchanged")
+    if (saved > skipped or checkpoints) and not store.commit():
+        return {
+            "success": False,
+            "message": "Failed to save memories to file"
+        }
+    
+    return {
+        "success": True,
+        "saved_count": saved,
+        "written_count": saved - skipped,
+        "updated_count": sum(1 for result in results if result.get("status") == "updated"),
+        "skipped_count": skipped,
+        "failed_count": len(results) - saved,
+        "results": results,
+        "message": f"Saved {saved} of {len(results)} Notion pages ({skipped} unchanged)"
+    }
 
 
 @mcp.tool()
-async def save_from_notion(
+@io.writer
+def save_from_notion(
     content: str,
     title: str,
     source_db: str,
@@ -66,6 +458,10 @@ async def save_from_notion(
 ) -> Dict:
     """
     Save information retrieved by Claude from Notion to local memory
+
+    Saving a page again (same notion_url) updates its memory in place, or
+    does nothing if the content is unchanged. Other memories with nearly
+    the same text are listed as near_duplicates.
     
     Args:
         content: Content retrieved from Notion
@@ -75,61 +471,24 @@ async def save_from_notion(
         tags: List of tags
     """
     try:
-        memories = load_json(MEMORIES_FILE)
-        index = load_json(INDEX_FILE)
-        
-        # Generate memory ID with UTC timestamp
-        memory_id = f"notion_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}"
-        
-        # Create memory structure
-        memory = {
-            "id": memory_id,
-            "type": "notion_import",
-            "content": {
-                "original": content,
-                "title": title,
-                "summary": content[:200] + "..." if len(content) > 200 else content
-            },
-            "metadata": {
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "source": f"Notion:{source_db}",
-                "notion_url": notion_url,
-                "tags": tags or [],
-                "importance": 0.7,
-                "access_count": 0
-            }
-        }
+        with io.lock:
+            memory_id, status = stage_notion_memory(content, title, source_db, notion_url, tags)
+            near = near_duplicate_report(memory_id) if status != "unchanged" else []
         
-        # Save memory
-        memories[memory_id] = memory
-        if not save_json(MEMORIES_FILE, memories):
+        if status != "unchanged" and not store.commit():
             return {
                 "success": False,
                 "message": "Failed to save memory to file"
             }
         
-        # Update index
-        if "notion_imports" not in index:
-            index["notion_imports"] = {}
-        if source_db not in index["notion_imports"]:
-            index["notion_imports"][source_db] = []
-        index["notion_imports"][source_db].append(memory_id)
-        
-        # Update tag index
-        if "tags" not in index:
-            index["tags"] = {}
-        for tag in (tags or []):
-            if tag not in index["tags"]:
-                index["tags"][tag] = []
-            index["tags"][tag].append(memory_id)
-        
-        save_json(INDEX_FILE, index)
-        
         return {
             "success": True,
             "memory_id": memory_id,
-            "message": f"Notion data saved: {title}",
-            "summary": memory["content"]["summary"]
+            "status": status,
+            "message": (f"Notion data unchanged: {title}" if status == "unchanged"
+                        else f"Notion data saved: {title}"),
+            "summary": notion_summary(content),
+            "near_duplicates": near
         }
     except Exception as e:
         return {
@@ -139,10 +498,34 @@ async def save_from_notion(
 
 
 @mcp.tool()
-async def get_daily_inspiration_prompt() -> Dict:
+@io.writer
+def save_many_from_notion(pages: List[Dict[str, Any]]) -> Dict:
+    """
+    Save a batch of Notion pages to local memory with a single commit
+    
+    Args:
+        pages: [{"content": "...", "title": "...", "source_db": "...",
+                 "notion_url": "...", "tags": ["..."],
+                 "created_time": "ISO 8601 (optional, defaults to now)",
+                 "notion_page_id": "... (optional, updates that page's memory)",
+                 "last_edited_time": "ISO 8601 (optional)"}]
+    """
+    try:
+        return save_notion_pages(pages)
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error saving batch from Notion: {str(e)}"
+        }
+
+
+@mcp.tool()
+@io.reader
+def get_daily_inspiration_prompt() -> Dict:
     """
     Generate daily inspiration prompts
-    Guide for Claude to search Notion
+    Dated prompts are answered from local memories when possible,
+    otherwise they guide Claude to search Notion
     """
     try:
         today = datetime.now()
@@ -172,12 +555,44 @@ async def get_daily_inspiration_prompt() -> Dict:
             }
         }
         
+        # Resolve the dated slots from the local date index (O(log n) per
+        # database), each from its own databases and never the same memory
+        # twice; a slot without a match keeps its Notion prompt
+        now_ms = int(today.timestamp() * 1000)
+        today_start = datetime(today.year, today.month, today.day)
+        year_ago_start = today_start - timedelta(days=365)
+        year_ago_sources = prompts["one_year_ago"]["databases"]
+        local_ids = {}
+        local_ids["one_year_ago"] = dates.sample_from(
+            dates.between(
+                int(year_ago_start.timestamp() * 1000),
+                int((year_ago_start + timedelta(days=1)).timestamp() * 1000),
+                year_ago_sources
+            )
+            # Otherwise any earlier year's entry for this calendar day
+            or dates.on_month_day(today.month, today.day, int(today_start.timestamp() * 1000),
+                                  year_ago_sources)
+        )
+        for slot in ("forgotten_idea", "past_learning"):
+            used = {memory_id for memory_id in local_ids.values() if memory_id is not None}
+            local_ids[slot] = dates.sample_before(
+                now_ms - prompts[slot]["days_ago"] * MS_PER_DAY, prompts[slot]["databases"], exclude=used
+            )
+        resolved = 0
+        for slot, memory_id in local_ids.items():
+            prompts[slot]["resolved_locally"] = memory_id is not None
+            if memory_id is not None:
+                prompts[slot]["memory"] = store.get(memory_id).copy()
+                prompts[slot]["memory_days_ago"] = (now_ms - store.columns.epoch_ms(memory_id)) // MS_PER_DAY
+                resolved += 1
+        
         return {
             "success": True,
             "date": today.strftime("%Y-%m-%d"),
             "prompts": prompts,
-            "message": "Generated Notion search prompts",
-            "instruction": "Use these prompts to search your Notion databases with Claude's Notion integration"
+            "resolved_locally": resolved,
+            "message": f"Generated prompts ({resolved} answered from local memories)",
+            "instruction": "Use the prompts without a local memory to search your Notion databases with Claude's Notion integration"
         }
     except Exception as e:
         return {
@@ -187,28 +602,25 @@ async def get_daily_inspiration_prompt() -> Dict:
 
 
 @mcp.tool()
-async def cache_serendipity(
-    discoveries: List[Dict[str, str]]
+@io.blocking
+def cache_serendipity(
+    discoveries: List[Dict[str, str]],
+    key: Optional[str] = None
 ) -> Dict:
     """
     Cache serendipitous discoveries for later retrieval
     
     Args:
         discoveries: [{"content": "...", "source": "...", "date": "..."}]
+        key: Cache key (default: today's date)
     """
     try:
-        cache = load_json(SERENDIPITY_FILE)
+        key = key or datetime.now().strftime("%Y-%m-%d")
         
-        today = datetime.now().strftime("%Y-%m-%d")
-        cache[today] = {
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "discoveries": discoveries,
-            "accessed": 0
-        }
-        
-        if save_json(SERENDIPITY_FILE, cache):
+        if serendipity.put(key, discoveries):
             return {
                 "success": True,
+                "key": key,
                 "cached_count": len(discoveries),
                 "message": "Serendipity cached successfully"
             }
@@ -225,56 +637,86 @@ async def cache_serendipity(
 
 
 @mcp.tool()
-async def get_random_memory(memory_type: Optional[str] = None) -> Dict:
+@io.blocking
+def get_serendipity(key: Optional[str] = None) -> Dict:
     """
-    Retrieve a random memory with aging bias (older memories more likely)
+    Read cached serendipitous discoveries
+    
+    Args:
+        key: Cache key (default: today's date)
     """
     try:
-        memories = load_json(MEMORIES_FILE)
+        key = key or datetime.now().strftime("%Y-%m-%d")
+        entry = serendipity.get(key)
+        
+        if entry is None:
+            return {
+                "success": True,
+                "cached": False,
+                "key": key,
+                "cache": serendipity.stats(),
+                "message": "Nothing cached for this key; search Notion and save the results with cache_serendipity"
+            }
         
-        if not memories:
+        return {
+            "success": True,
+            "cached": True,
+            "key": key,
+            "discoveries": entry["discoveries"],
+            "cached_at": ms_isoformat(entry["created_ms"]),
+            "cache": serendipity.stats(),
+            "message": f"Served {len(entry['discoveries'])} discoveries from cache"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error reading serendipity cache: {str(e)}"
+        }
+
+
+@mcp.tool()
+@io.reader
+def get_random_memory(memory_type: Optional[str] = None, collapse_duplicates: bool = False) -> Dict:
+    """
+    Retrieve a random memory with aging bias (older memories more likely)
+    
+    Args:
+        memory_type: Only draw memories of this type
+        collapse_duplicates: Draw a group of near-identical memories about
+            as often as a single memory
+    """
+    try:
+        if not len(store):
             return {
                 "success": False,
                 "message": "No memories saved yet"
             }
         
-        # Filter by type if specified
-        filtered_memories = memories
-        if memory_type:
-            filtered_memories = {
-                k: v for k, v in memories.items() 
-                if v.get("type") == memory_type
-            }
+        # Aging-biased draw (older = higher weight), optionally within one type
+        if collapse_duplicates:
+            picks = draw_collapsed(
+                lambda missing: [pick for pick in [sampler.sample(memory_type)] if pick], 1
+            )
+            picked = picks[0] if picks else None
+        else:
+            picked = sampler.sample(memory_type)
         
-        if not filtered_memories:
+        if picked is None:
             return {
                 "success": False,
                 "message": f"No memories of type '{memory_type}' found"
             }
         
-        # Apply aging bias (older memories have higher weight)
-        memory_list = list(filtered_memories.items())
+        selected_key, days_old = picked
         
-        weights = []
-        now = datetime.now(timezone.utc)
-        for _, memory in memory_list:
-            try:
-                created = datetime.fromisoformat(memory["metadata"]["timestamp"])
-                days_old = (now - created).days
-                weights.append(days_old + 1)  # Older = higher weight
-            except:
-                weights.append(1)  # Default weight if timestamp is invalid
-        
-        selected_key, selected_memory = random.choices(memory_list, weights=weights)[0]
-        
-        # Update access count
-        memories[selected_key]["metadata"]["access_count"] = memories[selected_key]["metadata"].get("access_count", 0) + 1
-        save_json(MEMORIES_FILE, memories)
+        # Update access count in the background (the reply shows it bumped)
+        io.submit_write(record_access, [selected_key])
+        selected_memory = with_access_recorded(store.get(selected_key))
         
         return {
             "success": True,
             "memory": selected_memory,
-            "days_old": weights[memory_list.index((selected_key, selected_memory))] - 1,
+            "days_old": days_old,
             "message": "Retrieved a memory from the past"
         }
     except Exception as e:
@@ -285,7 +727,72 @@ async def get_random_memory(memory_type: Optional[str] = None) -> Dict:
 
 
 @mcp.tool()
-async def link_claude_conversation(
+@io.reader
+def get_random_memories(
+    count: int = 3,
+    types: Optional[List[str]] = None,
+    without_replacement: bool = True,
+    collapse_duplicates: bool = False
+) -> Dict:
+    """
+    Retrieve several random memories at once with aging bias
+    
+    Args:
+        count: Number of memories to draw (1 to 50)
+        types: Memory types to draw from (all types if omitted)
+        without_replacement: Never return the same memory twice
+        collapse_duplicates: Never return two near-identical memories, and
+            draw a group of them about as often as a single memory
+    """
+    try:
+        if not 1 <= count <= MAX_RANDOM_MEMORIES:
+            return {
+                "success": False,
+                "message": f"count must be between 1 and {MAX_RANDOM_MEMORIES}"
+            }
+        
+        if not len(store):
+            return {
+                "success": False,
+                "message": "No memories saved yet"
+            }
+        
+        if collapse_duplicates:
+            picks = draw_collapsed(
+                lambda missing: sampler.sample_many(missing, types, without_replacement),
+                count, without_replacement
+            )
+        else:
+            picks = sampler.sample_many(count, types, without_replacement)
+        
+        if not picks:
+            return {
+                "success": False,
+                "message": f"No memories of types {types} found"
+            }
+        
+        # Update access counts with a single background commit
+        io.submit_write(record_access, [memory_id for memory_id, _ in picks])
+        
+        return {
+            "success": True,
+            "count": len(picks),
+            "memories": [
+                {"memory": with_access_recorded(store.get(memory_id)), "days_old": days_old}
+                for memory_id, days_old in picks
+            ],
+            "message": f"Retrieved {len(picks)} memories from the past"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error retrieving memories: {str(e)}"
+        }
+
+
+@mcp.tool()
+@io.writer
+def link_claude_conversation(
     summary: str,
     key_insights: List[str],
     related_topics: List[str]
@@ -299,11 +806,9 @@ async def link_claude_conversation(
         related_topics: Related topics
     """
     try:
-        memories = load_json(MEMORIES_FILE)
-        index = load_json(INDEX_FILE)
-        
-        # Generate conversation ID
-        conversation_id = f"conv_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}"
+        # Generate a time-sortable, collision-free conversation ID
+        now = datetime.now(timezone.utc)
+        conversation_id = new_memory_id("conv")
         
         memory = {
             "id": conversation_id,
@@ -314,30 +819,25 @@ async def link_claude_conversation(
                 "topics": related_topics
             },
             "metadata": {
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": now.isoformat(),
                 "source": "Claude Conversation",
                 "importance": 0.8,
                 "access_count": 0
             }
         }
         
-        memories[conversation_id] = memory
-        if not save_json(MEMORIES_FILE, memories):
+        # Save memory and update topic index
+        with io.lock:
+            store.put(memory)
+            for topic in related_topics:
+                store.index_add("topics", topic, conversation_id)
+        
+        if not store.commit():
             return {
                 "success": False,
                 "message": "Failed to save conversation memory"
             }
         
-        # Update topic index
-        if "topics" not in index:
-            index["topics"] = {}
-        for topic in related_topics:
-            if topic not in index["topics"]:
-                index["topics"][topic] = []
-            index["topics"][topic].append(conversation_id)
-        
-        save_json(INDEX_FILE, index)
-        
         return {
             "success": True,
             "conversation_id": conversation_id,
@@ -352,46 +852,103 @@ async def link_claude_conversation(
 
 
 @mcp.tool()
-async def search_by_context(
+@io.reader
+def search_by_context(
     context: str,
-    limit: int = 5
+    limit: int = 5,
+    memory_type: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    collapse_duplicates: bool = False,
+    semantic_weight: float = 0.0
 ) -> Dict:
     """
-    Search memories by context keywords
+    Search memories by context keywords (BM25-ranked), optionally blended
+    with local vector similarity
+    
+    Args:
+        context: Keywords to search for
+        limit: Maximum number of results
+        memory_type: Only return memories of this type (e.g. "conversation")
+        since: Only memories created at or after this ISO date/time
+        until: Only memories created before this ISO date/time
+        collapse_duplicates: Return only the best match of each group of
+            near-identical memories (the others are listed in its
+            near_duplicates)
+        semantic_weight: 0 ranks by keywords only, 1 only by vector
+            similarity (also finds memories worded differently), values in
+            between blend the two scores
     """
     try:
-        memories = load_json(MEMORIES_FILE)
-        index = load_json(INDEX_FILE)
-        
-        # Simple keyword matching
-        keywords = context.lower().split()
-        
-        # Score memories based on keyword matches
-        scores = {}
-        for memory_id, memory in memories.items():
-            score = 0
-            content_lower = json.dumps(memory.get("content", {})).lower()
-            
-            # Check content matches
-            for keyword in keywords:
-                if keyword in content_lower:
-                    score += 1
-            
-            # Check tag matches (higher weight)
-            for tag in memory.get("metadata", {}).get("tags", []):
-                if any(keyword in tag.lower() for keyword in keywords):
-                    score += 2
-                    
-            if score > 0:
-                scores[memory_id] = score
-        
-        # Sort by relevance score
-        sorted_results = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
+        if not 0 <= semantic_weight <= 1:
+            return {
+                "success": False,
+                "message": f"Invalid semantic_weight: {semantic_weight} (use 0 to 1)"
+            }
+        if semantic_weight and vectors is None:
+            return {
+                "success": False,
+                "message": "Semantic search needs NumPy (pip install numpy)"
+            }
+        
+        bounds = {}
+        for name, value in (("since", since), ("until", until)):
+            if value is not None:
+                parsed = parse_timestamp(value)
+                if parsed is None:
+                    return {
+                        "success": False,
+                        "message": f"Invalid {name} date: {value}"
+                    }
+                bounds[name] = int(parsed.timestamp() * 1000)
+        
+        # Type/date filters are one vectorized mask over the metadata columns
+        accept = mask = None
+        if memory_type is not None or bounds:
+            mask = store.columns.mask(memory_type, bounds.get("since"), bounds.get("until"))
+            accept = lambda memory_id: store.columns.selected(memory_id, mask)
+        
+        # BM25 ranking over the inverted index (tag matches are boosted),
+        # blended with the cosine of hashed TF-IDF vectors if asked to
+        components = {}
+        
+        def rank(fetch: int) -> List[Tuple[str, float]]:
+            if not semantic_weight:
+                return search_index.search(context, fetch, accept)
+            keyword = {}
+            if semantic_weight < 1:
+                keyword = search_index.score(context)
+                if accept is not None:
+                    keyword = {memory_id: score for memory_id, score in keyword.items() if accept(memory_id)}
+            ranked = vectors.search(context, fetch, mask, keyword, semantic_weight)
+            components.update((memory_id, parts) for memory_id, _, *parts in ranked)
+            return [(memory_id, score) for memory_id, score, _, _ in ranked]
+        
+        sorted_results = rank(limit)
+        collapsed = {}
+        if collapse_duplicates:
+            # Widen the candidate list until enough distinct results remain
+            fetch = limit
+            while True:
+                kept = duplicates.collapse([memory_id for memory_id, _ in sorted_results], limit)
+                if len(kept) >= limit or len(sorted_results) < fetch:
+                    break
+                fetch *= COLLAPSE_OVERFETCH
+                sorted_results = rank(fetch)
+            scores = dict(sorted_results)
+            collapsed = dict(kept)
+            sorted_results = [(memory_id, scores[memory_id]) for memory_id, _ in kept]
         
         results = []
         for memory_id, score in sorted_results:
-            memory = memories[memory_id].copy()
-            memory["relevance_score"] = score
+            memory = store.get(memory_id).copy()
+            memory["relevance_score"] = round(score, 4)
+            if memory_id in components:
+                keyword_score, semantic_score = components[memory_id]
+                memory["keyword_score"] = round(keyword_score, 4)
+                memory["semantic_score"] = round(semantic_score, 4)
+            if collapsed.get(memory_id):
+                memory["near_duplicates"] = collapsed[memory_id]
             results.append(memory)
         
         return {
@@ -409,51 +966,99 @@ async def search_by_context(
 
 
 @mcp.tool()
-async def get_memory_stats() -> Dict:
+@io.reader
+def find_duplicates(
+    threshold: Optional[float] = None,
+    memory_type: Optional[str] = None,
+    limit: int = 20
+) -> Dict:
+    """
+    Report groups of near-identical memories across the whole store
+    
+    Args:
+        threshold: Estimated similarity (0-1] from which memories count as
+            duplicates (default MNEME_DUPLICATE_THRESHOLD)
+        memory_type: Only compare memories of this type
+        limit: Maximum number of groups to list (largest first)
+    """
+    try:
+        if threshold is not None and not 0 < threshold <= 1:
+            return {
+                "success": False,
+                "message": f"Invalid threshold: {threshold}"
+            }
+        
+        accept = None
+        if memory_type is not None:
+            mask = store.columns.mask(memory_type, None, None)
+            accept = lambda memory_id: store.columns.selected(memory_id, mask)
+        groups = duplicates.groups(threshold, accept)
+        
+        report = []
+        for group in groups[:max(0, limit)]:
+            members = []
+            for memory_id in group:
+                memory = store.get(memory_id)
+                content = memory.get("content")
+                label = ""
+                if isinstance(content, dict):
+                    label = content.get("title") or content.get("summary") or ""
+                metadata = memory.get("metadata", {})
+                members.append({
+                    "memory_id": memory_id,
+                    "type": memory.get("type"),
+                    "title": label[:80],
+                    "timestamp": metadata.get("timestamp"),
+                    "access_count": metadata.get("access_count", 0)
+                })
+            # Suggest keeping the most used copy, the oldest on ties
+            keep = min(members, key=lambda member: (-member["access_count"], member["timestamp"] or ""))
+            report.append({"size": len(group), "keep": keep["memory_id"], "memories": members})
+        
+        redundant = sum(len(group) - 1 for group in groups)
+        return {
+            "success": True,
+            "scanned": len(duplicates),
+            "threshold": threshold if threshold is not None else duplicates.threshold,
+            "groups_found": len(groups),
+            "redundant_memories": redundant,
+            "groups": report,
+            "message": f"Found {len(groups)} groups of near-duplicates ({redundant} redundant memories)"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error finding duplicates: {str(e)}"
+        }
+
+
+@mcp.tool()
+@io.reader
+def get_memory_stats() -> Dict:
     """
     Get memory system statistics
     """
     try:
-        memories = load_json(MEMORIES_FILE)
-        index = load_json(INDEX_FILE)
-        
-        # Count by type
-        type_counts = {}
-        for memory in memories.values():
-            memory_type = memory.get("type", "unknown")
-            type_counts[memory_type] = type_counts.get(memory_type, 0) + 1
-        
-        # Calculate time span
-        if memories:
-            timestamps = []
-            for m in memories.values():
-                try:
-                    timestamp = datetime.fromisoformat(m["metadata"]["timestamp"])
-                    timestamps.append(timestamp)
-                except:
-                    pass
-            
-            if timestamps:
-                oldest = min(timestamps)
-                newest = max(timestamps)
-                days_span = (newest - oldest).days
-            else:
-                days_span = 0
-                oldest = newest = None
+        summary = stats.summary()
+        oldest, newest = summary.pop("oldest_ms"), summary.pop("newest_ms")
+        if oldest is not None:
+            days_span = (newest - oldest) // MS_PER_DAY
         else:
             days_span = 0
-            oldest = newest = None
+        
+        body_cache = getattr(getattr(store, "bodies", None), "cache", None)
+        if body_cache is not None:
+            summary["body_cache"] = body_cache.stats()
+        if vectors is not None:
+            summary["vector_index"] = vectors.stats()
         
         return {
             "success": True,
-            "total_memories": len(memories),
-            "type_distribution": type_counts,
-            "total_tags": len(index.get("tags", {})),
-            "total_topics": len(index.get("topics", {})),
-            "notion_sources": len(index.get("notion_imports", {})),
+            **summary,
+            **store.columns.totals(),
             "time_span_days": days_span,
-            "oldest_memory": oldest.isoformat() if oldest else None,
-            "newest_memory": newest.isoformat() if newest else None,
+            "oldest_memory": ms_isoformat(oldest),
+            "newest_memory": ms_isoformat(newest),
             "message": "Memory system statistics"
         }
     except Exception as e:
@@ -463,6 +1068,37 @@ async def get_memory_stats() -> Dict:
         }
 
 
+@mcp.tool()
+@io.writer
+def rebuild_stats() -> Dict:
+    """
+    Recompute memory statistics from scratch and compare them with the
+    incrementally maintained ones (verification / repair)
+    """
+    try:
+        # Only the writer holding the turn mutates the store, so it can be scanned
+        # without the lock; swapping in the result needs it
+        fresh = MemoryStats()
+        fresh.rebuild(store.items())
+        with io.lock:
+            mismatched = stats.differences(fresh)
+            if mismatched:
+                stats.rebuild(store.items())
+        
+        return {
+            "success": True,
+            "consistent": not mismatched,
+            "mismatched_fields": mismatched,
+            "total_memories": len(fresh.entries),
+            "message": "Statistics verified" if not mismatched else "Statistics were out of date and have been rebuilt"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error rebuilding statistics: {str(e)}"
+        }
+
+
 if __name__ == "__main__":
     print("Mneme - Personal Memory Lighthouse MCP Server (Fixed Version)")
     print("Works in conjunction with Claude's Notion integration")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Append-only body store for the Mneme memory store
+Large memory content lives here and is read lazily by (offset, length)
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class BodyCache:
+    """
+    LRU cache of decoded bodies, bounded by count and optionally by bytes
+
+    Sizes are the serialized body lengths, a stable proxy for the memory
+    the decoded content takes. A limit of 0 disables that bound; with
+    max_items == 0 nothing is cached at all.
+    """
+
+    def __init__(self, max_items: int, max_bytes: int = 0):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[int, Tuple[Dict, int]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: int) -> Optional[Dict]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: int, value: Dict, size: int):
+        if self.max_items <= 0 or (self.max_bytes and size > self.max_bytes):
+            return
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (value, size)
+        self.bytes += size
+        while len(self.entries) > self.max_items or (self.max_bytes and self.bytes > self.max_bytes):
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.bytes -= evicted_size
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict:
+        return {
+            "cached_bodies": len(self.entries),
+            "cached_bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class BodyStore:
+    """
+    One JSON document per line, addressed by byte offset and length
+
+    Bodies are never rewritten in place: replacing a memory appends a new
+    body and the metadata record simply points at it, so a body's offset
+    identifies it while the file is open and is the key of the optional
+    BodyCache. Replaced bodies are only reclaimed by compaction, which
+    copies the live ones into `compact_path` (write_compacted) and then
+    swaps that file in (install_compacted); offsets change, so the
+    handles are reopened and the cache is dropped. Other processes
+    notice the swap through replaced().
+    """
+
+    def __init__(self, path, cache: Optional[BodyCache] = None):
+        self.path = Path(path)
+        self.compact_path = self.path.with_name(self.path.name + ".compact")
+        self.cache = cache
+        # seek+read on the shared handle (and the cache) must not interleave
+        self._read_lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        self.path.touch(exist_ok=True)
+        # Unbuffered, so each body is a single write() on the O_APPEND handle
+        self._writer = open(self.path, 'ab', buffering=0)
+        self._reader = open(self.path, 'rb')
+
+    @property
+    def size(self) -> int:
+        return os.fstat(self._writer.fileno()).st_size
+
+    def append(self, content: Dict) -> Tuple[int, int]:
+        """Append a body and return its (offset, length)"""
+        data = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode('utf-8') + b"\n"
+        # The write lands at the end of the file even if another process
+        # appended meanwhile, and leaves our position just past it
+        self._writer.write(data)
+        end = os.lseek(self._writer.fileno(), 0, os.SEEK_CUR)
+        return end - len(data), len(data)
+
+    def read(self, offset: int, length: int, cached: bool = True) -> Dict:
+        """
+        Decode one body; `cached` reads go through the cache, bulk scans
+        should pass False so they do not flush the hot set
+        """
+        with self._read_lock:
+            if cached and self.cache is not None:
+                content = self.cache.get(offset)
+                if content is not None:
+                    return content
+            self._reader.seek(offset)
+            data = self._reader.read(length)
+        content = json.loads(data)
+        if cached and self.cache is not None:
+            with self._read_lock:
+                self.cache.put(offset, content, length)
+        return content
+
+    def sync(self):
+        """fsync appended bodies before metadata that references them"""
+        os.fsync(self._writer.fileno())
+
+    def write_compacted(self, bodies: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+        """
+        Copy the (offset, length) bodies to compact_path, fsynced, and
+        return old offset -> offset in the new file
+        """
+        offsets: Dict[int, int] = {}
+        position = 0
+        with open(self.compact_path, 'wb') as out, self._read_lock:
+            for offset, length in sorted(set(bodies)):
+                self._reader.seek(offset)
+                out.write(self._reader.read(length))
+                offsets[offset] = position
+                position += length
+            out.flush()
+            os.fsync(out.fileno())
+        return offsets
+
+    def install_compacted(self):
+        """Replace the body file with compact_path (offsets from write_compacted apply from now on)"""
+        os.replace(self.compact_path, self.path)
+        self.reopen()
+
+    def replaced(self) -> bool:
+        """True if the file at `path` is no longer the one we have open (compacted elsewhere)"""
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        opened = os.fstat(self._reader.fileno())
+        return (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+
+    def reopen(self):
+        """Open the file now at `path`; cached bodies are keyed by old offsets, so drop them"""
+        with self._read_lock:
+            self.close()
+            self._open()
+            if self.cache is not None:
+                self.cache.clear()
+
+    def close(self):
+        self._writer.close()
+        self._reader.close()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Serendipity cache for the Mneme MCP servers
+Bounded LRU with TTL, persisted as an append-only log
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from memory_journal import MemoryJournal
+from memory_persistence import StoreLock, write_file_atomic
+from memory_store import file_signature, load_json
+from memory_time import parse_timestamp
+
+# The log is rewritten from the live entries once it holds this many
+# records more than twice the number of entries
+COMPACT_SLACK = 64
+
+
+class SerendipityCache:
+    """
+    Discoveries cached under a key (a day, a theme, ...) for `ttl_hours`
+
+    At most `max_entries` keys are kept; the least recently used one is
+    evicted first. Every change is one appended line in the log:
+
+        {"op": "put", "key": "...", "created_ms": ..., "discoveries": [...]}
+        {"op": "touch", "key": "..."}
+        {"op": "evict", "key": "..."}
+
+    and replaying the log rebuilds the same LRU order. The log is
+    compacted once it is mostly superseded records. Hit/miss counters
+    cover the lifetime of the process. All operations are thread-safe.
+
+    Several processes can share the log: every replay, append and rewrite
+    holds the data directory's `.mneme.lock` exclusively, and a compaction
+    reloads the records other processes appended before it replaces the
+    file.
+    """
+
+    def __init__(self, path, ttl_hours: float = 24.0, max_entries: int = 100,
+                 legacy_path: Optional[Path] = None):
+        if max_entries < 1:
+            raise ValueError("Serendipity cache size must be at least 1")
+        self.log = MemoryJournal(path)
+        self.ttl_ms = int(ttl_hours * 3600 * 1000)
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._records = 0
+        self._signature = None
+        self._lock = threading.RLock()
+        self.file_lock = StoreLock(self.log.path.parent / ".mneme.lock")
+        with self.file_lock.exclusive():
+            if legacy_path is not None and not self.log.path.exists():
+                self._import_legacy(Path(legacy_path))
+            self.load()
+
+    def _import_legacy(self, legacy_path: Path):
+        """Carry over the day-keyed serendipity_cache.json of earlier versions"""
+        legacy = load_json(legacy_path)
+        records = []
+        for key, entry in sorted(legacy.items(), key=lambda item: item[1].get("created_at", "")):
+            created = parse_timestamp(entry.get("created_at"))
+            if created is None or not isinstance(entry.get("discoveries"), list):
+                continue
+            records.append({
+                "op": "put", "key": key,
+                "created_ms": int(created.timestamp() * 1000),
+                "discoveries": entry["discoveries"],
+            })
+        self._rewrite(records)
+
+    # ------------------------------------------------------------------
+    # Log
+    # ------------------------------------------------------------------
+
+    def load(self):
+        """Rebuild the entries by replaying the log"""
+        with self._lock, self.file_lock.exclusive():
+            records, _ = self.log.replay(0)
+            self.entries.clear()
+            for record in records:
+                self._apply(record)
+            self._records = len(records)
+            self._signature = file_signature(self.log.path)
+
+    def refresh(self):
+        """Reload if another process appended to the log"""
+        if file_signature(self.log.path) != self._signature:
+            self.load()
+
+    def _apply(self, record: Dict):
+        op, key = record.get("op"), record.get("key")
+        if op == "put":
+            self.entries[key] = {
+                "created_ms": record["created_ms"],
+                "discoveries": record["discoveries"],
+            }
+            self.entries.move_to_end(key)
+        elif op == "touch" and key in self.entries:
+            self.entries.move_to_end(key)
+        elif op == "evict":
+            self.entries.pop(key, None)
+
+    def _append(self, records: List[Dict]) -> bool:
+        with self.file_lock.exclusive():
+            current = file_signature(self.log.path) == self._signature
+            # Cache contents are recomputable, so appends are not fsync'd
+            if not self.log.append(records, fsync=False):
+                return False
+            for record in records:
+                self._apply(record)
+            self._records += len(records)
+            if current:
+                # Nothing else was appended since the last replay
+                self._signature = file_signature(self.log.path)
+            if self._records > 2 * len(self.entries) + COMPACT_SLACK:
+                self.compact()
+        return True
+
+    def _rewrite(self, records: List[Dict]):
+        """Replace the log; only call while holding the file lock exclusively"""
+        write_file_atomic(
+            self.log.path,
+            "".join(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+                    for record in records),
+            fsync=False
+        )
+        self._records = len(records)
+
+    def compact(self):
+        """Rewrite the log as one put per live entry, in LRU order"""
+        with self._lock, self.file_lock.exclusive():
+            # Pick up records other processes appended since the last replay
+            self.refresh()
+            self._rewrite([
+                {"op": "put", "key": key, **entry} for key, entry in self.entries.items()
+            ])
+            self._signature = file_signature(self.log.path)
+
+    # ------------------------------------------------------------------
+    # Cache operations
+    # ------------------------------------------------------------------
+
+    def _expired(self, entry: Dict, now_ms: int) -> bool:
+        return now_ms - entry["created_ms"] >= self.ttl_ms
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Fresh entry for `key` (marked most recently used) or None"""
+        with self._lock:
+            self.refresh()
+            now_ms = int(time.time() * 1000)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self._expired(entry, now_ms):
+                self.misses += 1
+                self._append([{"op": "evict", "key": key}])
+                return None
+            self.hits += 1
+            self._append([{"op": "touch", "key": key}])
+            return entry
+
+    def put(self, key: str, discoveries: List[Dict]) -> bool:
+        """Cache discoveries under `key`, evicting expired and then LRU entries"""
+        with self._lock:
+            self.refresh()
+            now_ms = int(time.time() * 1000)
+            records = [{"op": "put", "key": key, "created_ms": now_ms, "discoveries": discoveries}]
+            remaining = {k: e for k, e in self.entries.items() if k != key}
+            stale = [k for k, e in remaining.items() if self._expired(e, now_ms)]
+            for k in stale:
+                del remaining[k]
+            # `remaining` keeps LRU order, so the oldest entries come first
+            overflow = list(remaining)[:max(0, len(remaining) + 1 - self.max_entries)]
+            self.evictions += len(stale) + len(overflow)
+            evicted = [{"op": "evict", "key": k} for k in stale + overflow]
+            return self._append(evicted + records)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_hours": self.ttl_ms / 3600000,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Columnar metadata for the Mneme memory store
+Per-memory scalars in parallel arrays for vectorized filters and totals
+"""
+
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from memory_time import MS_PER_DAY, timestamp_ms
+
+# NumPy is optional: without it the columns are array.array and the
+# vectorized queries fall back to plain loops
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Slot value for memories without a usable timestamp
+MISSING = -(1 << 63)
+
+# Code of emptied slots (type) and of memories without a Notion source
+NO_CODE = -1
+
+# name -> (array typecode, fill value)
+COLUMNS = {
+    "epoch_ms": ("q", MISSING),
+    "day": ("q", MISSING),
+    "type_code": ("q", NO_CODE),
+    "source_code": ("q", NO_CODE),
+    "importance": ("d", float("nan")),
+    "access_count": ("q", 0),
+}
+
+
+def source_db(memory: Dict) -> Optional[str]:
+    """Notion database name of a memory imported from Notion, else None"""
+    source = memory.get("metadata", {}).get("source") or ""
+    return source.split(":", 1)[1] if source.startswith("Notion:") else None
+
+
+def source_key(name: Optional[str]) -> Optional[str]:
+    """
+    Comparable form of a Notion database name: "Learning Log",
+    "learning_log" and "learning-log" all give "learning log"
+    """
+    if not name:
+        return None
+    return " ".join(name.replace("_", " ").replace("-", " ").split()).casefold() or None
+
+
+class MetadataColumns:
+    """
+    Scalar metadata of every memory as parallel arrays (store listener)
+
+    Each memory owns one slot across the columns: creation time (epoch
+    milliseconds and day ordinal, parsed once), type and Notion source
+    as small integer codes, importance and access_count. Capacity
+    doubles when full, so appends are amortized O(1).
+
+    Stores register the table as their first listener, so other
+    listeners can read a memory's creation time from it in add() and
+    rebuild() instead of parsing the ISO string again. Filters and totals
+    are single vectorized expressions over the columns when NumPy is
+    installed.
+    """
+
+    needs_content = False
+
+    def __init__(self, capacity: int = 1024):
+        self.initial_capacity = capacity
+        self.clear()
+
+    def clear(self):
+        self.ids: List[Optional[str]] = []
+        self.positions: Dict[str, int] = {}
+        self.type_codes: Dict[str, int] = {}
+        self.source_codes: Dict[str, int] = {}
+        self.capacity = 0
+        self.columns: Dict[str, object] = {name: self._allocate(name, 0) for name in COLUMNS}
+        self._reserve(self.initial_capacity)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def column(self, name: str):
+        """One column trimmed to the used slots"""
+        return self.columns[name][:len(self.ids)]
+
+    @staticmethod
+    def _allocate(name: str, size: int):
+        typecode, fill = COLUMNS[name]
+        if np is not None:
+            return np.full(size, fill, dtype=np.int64 if typecode == "q" else np.float64)
+        return array(typecode, [fill]) * size
+
+    def _reserve(self, capacity: int):
+        if capacity <= self.capacity:
+            return
+        for name, column in self.columns.items():
+            extra = self._allocate(name, capacity - self.capacity)
+            if np is not None:
+                self.columns[name] = np.concatenate((column, extra))
+            else:
+                column.extend(extra)
+        self.capacity = capacity
+
+    @staticmethod
+    def _code(codes: Dict[str, int], key: Optional[str]) -> int:
+        if key is None:
+            return NO_CODE
+        return codes.setdefault(key, len(codes))
+
+    def _set(self, memory_id: str, memory: Dict):
+        position = self.positions.get(memory_id)
+        if position is None:
+            position = len(self.ids)
+            if position >= self.capacity:
+                self._reserve(max(self.initial_capacity, 2 * self.capacity))
+            self.ids.append(memory_id)
+            self.positions[memory_id] = position
+        epoch_ms = timestamp_ms(memory)
+        metadata = memory.get("metadata", {})
+        importance = metadata.get("importance")
+        values = {
+            "epoch_ms": MISSING if epoch_ms is None else epoch_ms,
+            "day": MISSING if epoch_ms is None else epoch_ms // MS_PER_DAY,
+            "type_code": self._code(self.type_codes, memory.get("type", "unknown")),
+            "source_code": self._code(self.source_codes, source_db(memory)),
+            "importance": float(importance) if isinstance(importance, (int, float)) else float("nan"),
+            "access_count": int(metadata.get("access_count", 0) or 0),
+        }
+        for name, value in values.items():
+            self.columns[name][position] = value
+
+    # ------------------------------------------------------------------
+    # Listener protocol
+    # ------------------------------------------------------------------
+
+    def rebuild(self, items: Iterable[Tuple[str, Dict]]):
+        self.clear()
+        for memory_id, memory in items:
+            self._set(memory_id, memory)
+
+    def add(self, memory_id: str, memory: Dict):
+        self._set(memory_id, memory)
+
+    def remove(self, memory_id: str):
+        # The slot itself is only reclaimed by the next rebuild()
+        position = self.positions.pop(memory_id, None)
+        if position is None:
+            return
+        self.ids[position] = None
+        for name, (_, fill) in COLUMNS.items():
+            self.columns[name][position] = fill
+
+    def set_access_count(self, memory_id: str, count: int):
+        position = self.positions.get(memory_id)
+        if position is not None:
+            self.columns["access_count"][position] = count
+
+    def bump_access(self, memory_id: str):
+        position = self.positions.get(memory_id)
+        if position is not None:
+            self.columns["access_count"][position] += 1
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def epoch_ms(self, memory_id: str) -> Optional[int]:
+        position = self.positions.get(memory_id)
+        if position is None or self.columns["epoch_ms"][position] == MISSING:
+            return None
+        return int(self.columns["epoch_ms"][position])
+
+    def day(self, memory_id: str) -> Optional[int]:
+        position = self.positions.get(memory_id)
+        if position is None or self.columns["day"][position] == MISSING:
+            return None
+        return int(self.columns["day"][position])
+
+    # ------------------------------------------------------------------
+    # Vectorized queries
+    # ------------------------------------------------------------------
+
+    def mask(self, memory_type: Optional[str] = None, since_ms: Optional[int] = None,
+             until_ms: Optional[int] = None):
+        """
+        Per-slot booleans: live memories of `memory_type` created in
+        [since_ms, until_ms) (undated memories fail any date bound)
+        """
+        type_code = self.type_codes.get(memory_type, NO_CODE) if memory_type is not None else None
+        if memory_type is not None and type_code == NO_CODE:
+            return self._falses()
+        epochs = self.column("epoch_ms")
+        types = self.column("type_code")
+        if np is not None:
+            selected = types != NO_CODE
+            if type_code is not None:
+                selected &= types == type_code
+            if since_ms is not None or until_ms is not None:
+                selected &= epochs != MISSING
+            if since_ms is not None:
+                selected &= epochs >= since_ms
+            if until_ms is not None:
+                selected &= epochs < until_ms
+            return selected
+        dated = since_ms is not None or until_ms is not None
+        return [
+            types[i] != NO_CODE
+            and (type_code is None or types[i] == type_code)
+            and not (dated and epochs[i] == MISSING)
+            and (since_ms is None or epochs[i] >= since_ms)
+            and (until_ms is None or epochs[i] < until_ms)
+            for i in range(len(self.ids))
+        ]
+
+    def _falses(self):
+        if np is not None:
+            return np.zeros(len(self.ids), dtype=bool)
+        return [False] * len(self.ids)
+
+    def selected(self, memory_id: str, mask) -> bool:
+        """Whether a memory passed a mask() computed after it was stored"""
+        position = self.positions.get(memory_id)
+        return position is not None and position < len(mask) and bool(mask[position])
+
+    def ids_where(self, mask) -> List[str]:
+        """Memory IDs of the selected slots"""
+        if np is not None:
+            return [self.ids[i] for i in np.flatnonzero(mask)]
+        return [self.ids[i] for i, keep in enumerate(mask) if keep]
+
+    def totals(self) -> Dict:
+        """Total access count and mean importance over live memories"""
+        live = self.mask()
+        if np is not None:
+            importance = self.column("importance")[live]
+            rated = importance[~np.isnan(importance)]
+            return {
+                "total_accesses": int(self.column("access_count")[live].sum()),
+                "average_importance": float(rated.mean()) if rated.size else None,
+            }
+        accesses = [count for count, keep in zip(self.column("access_count"), live) if keep]
+        rated = [
+            value for value, keep in zip(self.column("importance"), live)
+            if keep and value == value  # NaN marks a missing importance
+        ]
+        return {
+            "total_accesses": sum(accesses),
+            "average_importance": sum(rated) / len(rated) if rated else None,
+        }
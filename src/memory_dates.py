@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Date index for the Mneme memory store
+"On this day" and "older than N days" lookups without scanning every memory
+"""
+
+import bisect
+import random
+from datetime import datetime
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+
+from memory_columns import MetadataColumns, source_db, source_key
+from memory_time import timestamp_ms
+
+
+def local_month_day(epoch_ms: int) -> str:
+    """"MM-DD" of an epoch in local time (the key of DateIndex buckets)"""
+    return datetime.fromtimestamp(epoch_ms / 1000).strftime("%m-%d")
+
+
+class DateIndex:
+    """
+    "On this day" lookups over memory creation times (store listener)
+
+    Memories are kept in a sorted epoch array for O(log n) range queries
+    (a given day, "older than N days"), in one such array per Notion
+    source for queries restricted to some databases, and in month-day
+    buckets for anniversaries across years. Database names are compared
+    through source_key(), so "Learning Log" matches "learning_log".
+    Creation times are read from the store's MetadataColumns when given.
+    """
+
+    needs_content = False
+
+    def __init__(self, columns: Optional[MetadataColumns] = None,
+                 rng: Optional[random.Random] = None):
+        self.columns = columns
+        self.rng = rng or random.Random()
+        self.clear()
+
+    def clear(self):
+        self.epochs: List[int] = []
+        self.ids: List[str] = []
+        # source key -> (sorted epochs, IDs in the same order)
+        self.by_source: Dict[str, Tuple[List[int], List[str]]] = {}
+        self.by_month_day: Dict[str, List[str]] = {}
+        self.created: Dict[str, int] = {}
+        self.sources: Dict[str, Optional[str]] = {}
+
+    def _created_ms(self, memory_id: str, memory: Dict) -> Optional[int]:
+        if self.columns is not None:
+            return self.columns.epoch_ms(memory_id)
+        return timestamp_ms(memory)
+
+    # ------------------------------------------------------------------
+    # Listener protocol
+    # ------------------------------------------------------------------
+
+    def rebuild(self, items: Iterable[Tuple[str, Dict]]):
+        self.clear()
+        entries = []
+        for memory_id, memory in items:
+            epoch_ms = self._created_ms(memory_id, memory)
+            if epoch_ms is None:
+                continue
+            entries.append((epoch_ms, memory_id))
+            self.created[memory_id] = epoch_ms
+            self.sources[memory_id] = source_key(source_db(memory))
+            self.by_month_day.setdefault(local_month_day(epoch_ms), []).append(memory_id)
+        entries.sort()
+        self.epochs = [epoch_ms for epoch_ms, _ in entries]
+        self.ids = [memory_id for _, memory_id in entries]
+        for epoch_ms, memory_id in entries:
+            source = self.sources[memory_id]
+            if source is not None:
+                epochs, ids = self.by_source.setdefault(source, ([], []))
+                epochs.append(epoch_ms)
+                ids.append(memory_id)
+
+    def add(self, memory_id: str, memory: Dict):
+        self.remove(memory_id)
+        epoch_ms = self._created_ms(memory_id, memory)
+        if epoch_ms is None:
+            return
+        self.created[memory_id] = epoch_ms
+        self.sources[memory_id] = source = source_key(source_db(memory))
+        self._insert(self.epochs, self.ids, epoch_ms, memory_id)
+        if source is not None:
+            self._insert(*self.by_source.setdefault(source, ([], [])), epoch_ms, memory_id)
+        self.by_month_day.setdefault(local_month_day(epoch_ms), []).append(memory_id)
+
+    def remove(self, memory_id: str):
+        epoch_ms = self.created.pop(memory_id, None)
+        if epoch_ms is None:
+            return
+        source = self.sources.pop(memory_id)
+        self._delete(self.epochs, self.ids, epoch_ms, memory_id)
+        if source is not None:
+            epochs, ids = self.by_source[source]
+            self._delete(epochs, ids, epoch_ms, memory_id)
+            if not ids:
+                del self.by_source[source]
+        bucket = self.by_month_day[local_month_day(epoch_ms)]
+        bucket.remove(memory_id)
+        if not bucket:
+            del self.by_month_day[local_month_day(epoch_ms)]
+
+    @staticmethod
+    def _insert(epochs: List[int], ids: List[str], epoch_ms: int, memory_id: str):
+        # New memories are usually the newest, so this is mostly an append
+        position = bisect.bisect_right(epochs, epoch_ms)
+        epochs.insert(position, epoch_ms)
+        ids.insert(position, memory_id)
+
+    @staticmethod
+    def _delete(epochs: List[int], ids: List[str], epoch_ms: int, memory_id: str):
+        position = bisect.bisect_left(epochs, epoch_ms)
+        while ids[position] != memory_id:
+            position += 1
+        del epochs[position]
+        del ids[position]
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _arrays(self, sources: Optional[Iterable[str]]) -> List[Tuple[List[int], List[str]]]:
+        """The sorted arrays to query: all memories, or those of the given databases"""
+        if not sources:
+            return [(self.epochs, self.ids)]
+        keys = {source_key(source) for source in sources}
+        return [self.by_source[key] for key in keys if key in self.by_source]
+
+    def _matches(self, memory_id: str, sources: Optional[Iterable[str]]) -> bool:
+        return not sources or self.sources[memory_id] in {source_key(source) for source in sources}
+
+    def between(self, start_ms: int, end_ms: int,
+                sources: Optional[Iterable[str]] = None) -> List[str]:
+        """IDs created in [start_ms, end_ms), oldest first (from `sources` only if given)"""
+        arrays = self._arrays(sources)
+        found = []
+        for epochs, ids in arrays:
+            low = bisect.bisect_left(epochs, start_ms)
+            high = bisect.bisect_left(epochs, end_ms)
+            found.extend(ids[low:high])
+        if len(arrays) > 1:
+            found.sort(key=lambda memory_id: self.created[memory_id])
+        return found
+
+    def on_month_day(self, month: int, day: int, before_ms: int,
+                     sources: Optional[Iterable[str]] = None) -> List[str]:
+        """IDs created on this month/day (local time) of any year, before `before_ms`"""
+        bucket = self.by_month_day.get(f"{month:02d}-{day:02d}", [])
+        return [
+            memory_id for memory_id in bucket
+            if self.created[memory_id] < before_ms and self._matches(memory_id, sources)
+        ]
+
+    def sample_from(self, memory_ids: List[str], exclude: Collection[str] = ()) -> Optional[str]:
+        """A random ID from a query result other than `exclude`, None if there is none"""
+        candidates = [memory_id for memory_id in memory_ids if memory_id not in exclude]
+        return self.rng.choice(candidates) if candidates else None
+
+    def sample_before(self, cutoff_ms: int, sources: Optional[Iterable[str]] = None,
+                      exclude: Collection[str] = ()) -> Optional[str]:
+        """
+        A random memory created before `cutoff_ms`, from the given Notion
+        sources only if any are given and never one in `exclude`; None if
+        there is none. O(log n) per source.
+        """
+        ranges = [(ids, bisect.bisect_left(epochs, cutoff_ms)) for epochs, ids in self._arrays(sources)]
+        total = sum(count for _, count in ranges)
+        if not total:
+            return None
+        start = self.rng.randrange(total)
+        # Walk on from the draw past excluded IDs (there are few of them)
+        for step in range(min(total, len(exclude) + 1)):
+            offset = (start + step) % total
+            for ids, count in ranges:
+                if offset < count:
+                    memory_id = ids[offset]
+                    break
+                offset -= count
+            if memory_id not in exclude:
+                return memory_id
+        return None
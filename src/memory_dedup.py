@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection for the Mneme memory store
+MinHash signatures over character shingles with an LSH banding index
+"""
+
+import base64
+import random
+import re
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from memory_persistence import load_derived, save_derived
+from memory_search import content_text
+
+# NumPy is optional: without it signatures are computed with plain loops
+# (same values, just slower)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Shingles are runs of this many characters of the normalized text
+SHINGLE_SIZE = 5
+
+# 64 hash functions in 16 bands of 4 rows: a pair with Jaccard
+# similarity 0.7 shares a band with probability 0.99, one at 0.3 with
+# about 0.12 (candidates are then checked on the full signature)
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# Estimated Jaccard similarity from which two memories count as duplicates
+DEFAULT_THRESHOLD = 0.7
+
+# Universal hashing (a * x + b) mod p with fixed parameters, so
+# signatures are comparable across processes and restarts
+MERSENNE_PRIME = (1 << 61) - 1
+MASK_32 = 0xFFFFFFFF
+MASK_64 = (1 << 64) - 1
+ROLLING_BASE = 1_000_003
+MIX = 0x9E3779B97F4A7C15
+_params = random.Random(1729)
+PERM_A = [_params.randrange(1, 1 << 31) for _ in range(NUM_PERM)]
+PERM_B = [_params.randrange(0, MERSENNE_PRIME) for _ in range(NUM_PERM)]
+
+# Shingle hashes processed per step by the NumPy path (bounds the
+# NUM_PERM x chunk intermediate matrix)
+CHUNK = 8192
+
+# Bump when shingling or hashing changes so persisted signatures get rebuilt
+INDEX_FORMAT_VERSION = 1
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """NFKC, lowercase, whitespace runs collapsed to one space"""
+    return WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text).lower()).strip()
+
+
+def shingle_hashes(text: str) -> List[int]:
+    """32-bit hashes of the distinct SHINGLE_SIZE-character shingles of a text"""
+    codes = [ord(char) for char in normalize(text)]
+    if not codes:
+        return []
+    width = min(SHINGLE_SIZE, len(codes))
+    hashes = set()
+    for start in range(len(codes) - width + 1):
+        value = 0
+        for code in codes[start:start + width]:
+            value = (value * ROLLING_BASE + code) & MASK_64
+        hashes.add(((value * MIX) & MASK_64) >> 32)
+    return sorted(hashes)
+
+
+def _shingle_hashes_numpy(text: str):
+    codes = np.frombuffer(normalize(text).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if not len(codes):
+        return codes
+    width = min(SHINGLE_SIZE, len(codes))
+    count = len(codes) - width + 1
+    value = np.zeros(count, dtype=np.uint64)
+    for offset in range(width):
+        value = value * np.uint64(ROLLING_BASE) + codes[offset:offset + count]
+    return np.unique((value * np.uint64(MIX)) >> np.uint64(32))
+
+
+def minhash(text: str) -> Optional[bytes]:
+    """MinHash signature of a text (NUM_PERM 32-bit minima), None if it is empty"""
+    if np is None:
+        hashes = shingle_hashes(text)
+        if not hashes:
+            return None
+        signature = array("I", (
+            min((a * x + b) % MERSENNE_PRIME for x in hashes) & MASK_32
+            for a, b in zip(PERM_A, PERM_B)
+        ))
+        return signature.tobytes()
+    hashes = _shingle_hashes_numpy(text)
+    if not len(hashes):
+        return None
+    a = np.array(PERM_A, dtype=np.uint64)[:, None]
+    b = np.array(PERM_B, dtype=np.uint64)[:, None]
+    prime = np.uint64(MERSENNE_PRIME)
+    minima = np.full(NUM_PERM, MERSENNE_PRIME, dtype=np.uint64)
+    for start in range(0, len(hashes), CHUNK):
+        # a < 2^31 and x < 2^32, so a * x + b stays below 2^64
+        chunk = hashes[start:start + CHUNK][None, :]
+        np.minimum(minima, ((a * chunk + b) % prime).min(axis=1), out=minima)
+    return (minima & np.uint64(MASK_32)).astype(np.uint32).tobytes()
+
+
+def similarity(first: bytes, second: bytes) -> float:
+    """Estimated Jaccard similarity: share of equal signature positions"""
+    if np is not None:
+        return float(np.mean(np.frombuffer(first, np.uint32) == np.frombuffer(second, np.uint32)))
+    return sum(x == y for x, y in zip(array("I", first), array("I", second))) / NUM_PERM
+
+
+class DuplicateIndex:
+    """
+    memory_id -> MinHash signature, bucketed by LSH bands
+
+    Kept current through the MemoryStore listener protocol (rebuild/add/
+    remove), so signatures are computed once, when a memory is saved.
+    near_duplicates() only looks at memories sharing a band bucket and
+    confirms each candidate on the full signature, so a lookup does not
+    depend on the size of the store.
+
+    With a persist path the signatures are saved by persist() together
+    with the store signature they reflect; restore() reloads them at
+    startup instead of re-reading every memory, as long as it still
+    matches (as for the search index).
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, persist_path: Optional[Path] = None):
+        if not 0 < threshold <= 1:
+            raise ValueError("Duplicate threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.clear()
+
+    def clear(self):
+        self.signatures: Dict[str, bytes] = {}
+        self.buckets: List[Dict[bytes, set]] = [{} for _ in range(BANDS)]
+
+    def __len__(self):
+        return len(self.signatures)
+
+    # ------------------------------------------------------------------
+    # Listener protocol
+    # ------------------------------------------------------------------
+
+    def rebuild(self, items: Iterable[Tuple[str, Dict]]):
+        self.clear()
+        for memory_id, memory in items:
+            self.add(memory_id, memory)
+
+    def add(self, memory_id: str, memory: Dict):
+        signature = minhash(content_text(memory.get("content", {})))
+        if self.signatures.get(memory_id) == signature:
+            return
+        self.remove(memory_id)
+        if signature is not None:
+            self._insert(memory_id, signature)
+
+    def remove(self, memory_id: str):
+        signature = self.signatures.pop(memory_id, None)
+        if signature is None:
+            return
+        for band, key in self._bands(signature):
+            members = self.buckets[band].get(key)
+            if members is not None:
+                members.discard(memory_id)
+                if not members:
+                    del self.buckets[band][key]
+
+    def _insert(self, memory_id: str, signature: bytes):
+        self.signatures[memory_id] = signature
+        for band, key in self._bands(signature):
+            self.buckets[band].setdefault(key, set()).add(memory_id)
+
+    @staticmethod
+    def _bands(signature: bytes):
+        width = ROWS * 4
+        for band in range(BANDS):
+            yield band, signature[band * width:(band + 1) * width]
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _header(self, signature) -> Dict:
+        return {
+            "version": INDEX_FORMAT_VERSION,
+            "minhash": [SHINGLE_SIZE, NUM_PERM, BANDS],
+            "signature": signature,
+        }
+
+    def persist(self, signature) -> bool:
+        """Save the signatures as reflecting the store state `signature`"""
+        if self.persist_path is None:
+            return False
+        payload = {
+            "signatures": {
+                memory_id: base64.b64encode(value).decode("ascii")
+                for memory_id, value in self.signatures.items()
+            },
+        }
+        try:
+            save_derived(self.persist_path, self._header(signature), payload)
+            return True
+        except Exception as e:
+            print(f"Error saving duplicate index to {self.persist_path}: {e}")
+            return False
+
+    def restore(self, signature) -> bool:
+        """Load persisted signatures if they match `signature`; False means rebuild"""
+        if self.persist_path is None:
+            return False
+        data = load_derived(self.persist_path, self._header(signature))
+        if data is None:
+            return False
+        self.clear()
+        for memory_id, value in data["signatures"].items():
+            self._insert(memory_id, base64.b64decode(value))
+        return True
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def similarity(self, first_id: str, second_id: str) -> Optional[float]:
+        """Estimated similarity of two indexed memories (None if either has no text)"""
+        first, second = self.signatures.get(first_id), self.signatures.get(second_id)
+        if first is None or second is None:
+            return None
+        return similarity(first, second)
+
+    def near_duplicates(self, memory_id: str, threshold: Optional[float] = None) -> List[Tuple[str, float]]:
+        """(memory_id, similarity) of the other memories at or above the threshold, closest first"""
+        signature = self.signatures.get(memory_id)
+        if signature is None:
+            return []
+        threshold = self.threshold if threshold is None else threshold
+        candidates = set()
+        for band, key in self._bands(signature):
+            candidates.update(self.buckets[band].get(key, ()))
+        candidates.discard(memory_id)
+        candidates = list(candidates)
+        if np is not None and candidates:
+            stacked = np.frombuffer(
+                b"".join(self.signatures[other] for other in candidates), dtype=np.uint32
+            ).reshape(len(candidates), NUM_PERM)
+            scores = (stacked == np.frombuffer(signature, dtype=np.uint32)).mean(axis=1).tolist()
+        else:
+            scores = [similarity(signature, self.signatures[other]) for other in candidates]
+        matches = [
+            (other, score) for other, score in zip(candidates, scores) if score >= threshold
+        ]
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches
+
+    def group_size(self, memory_id: str) -> int:
+        """Number of memories in the near-duplicate group of `memory_id` (itself included)"""
+        return 1 + len(self.near_duplicates(memory_id))
+
+    def collapse(self, memory_ids: Iterable[str], limit: int) -> List[Tuple[str, List[str]]]:
+        """
+        Keep the first of each group of near-duplicates in `memory_ids`
+
+        Returns up to `limit` (kept_id, [collapsed ids]) pairs in input
+        order; later near-copies of a kept memory are listed under it.
+        """
+        kept: List[Tuple[str, List[str]]] = []
+        position: Dict[str, int] = {}
+        for memory_id in memory_ids:
+            if memory_id in position:
+                continue
+            owner = next(
+                (position[other] for other, _ in self.near_duplicates(memory_id) if other in position),
+                None
+            )
+            if owner is not None:
+                kept[owner][1].append(memory_id)
+                position[memory_id] = owner
+            elif len(kept) < limit:
+                position[memory_id] = len(kept)
+                kept.append((memory_id, []))
+        return kept
+
+    def groups(self, threshold: Optional[float] = None,
+               accept: Optional[Callable[[str], bool]] = None) -> List[List[str]]:
+        """
+        Near-duplicate groups among the indexed memories passing `accept`
+
+        Memories are joined when their similarity reaches the threshold,
+        so a group holds chains of close copies. Groups are returned
+        largest first, each sorted by memory ID.
+        """
+        parent: Dict[str, str] = {}
+
+        def find(memory_id: str) -> str:
+            root = memory_id
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while memory_id != root:
+                parent[memory_id], memory_id = root, parent[memory_id]
+            return root
+
+        for memory_id in self.signatures:
+            if accept is not None and not accept(memory_id):
+                continue
+            for other, _ in self.near_duplicates(memory_id, threshold):
+                if accept is not None and not accept(other):
+                    continue
+                parent.setdefault(memory_id, memory_id)
+                parent.setdefault(other, other)
+                root, other_root = find(memory_id), find(other)
+                if root != other_root:
+                    parent[max(root, other_root)] = min(root, other_root)
+
+        members: Dict[str, List[str]] = {}
+        for memory_id in parent:
+            members.setdefault(find(memory_id), []).append(memory_id)
+        return sorted(
+            (sorted(group) for group in members.values()),
+            key=lambda group: (-len(group), group[0])
+        )
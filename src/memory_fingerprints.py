@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Content fingerprints for the Mneme MCP servers
+Stable Notion page keys and content hashes for change detection at ingest
+"""
+
+import hashlib
+import json
+import re
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+# Notion page IDs are UUIDs; URLs end in the 32 hex digits, dashed or not
+PAGE_ID = re.compile(r"[0-9a-f]{32}")
+URL_PAGE_ID = re.compile(r"([0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$")
+
+# 128-bit digests: collisions are negligible at any store size
+DIGEST_SIZE = 16
+
+
+def notion_page_key(page_id: Optional[str] = None, notion_url: Optional[str] = None) -> Optional[str]:
+    """
+    Key identifying a Notion page across saves, or None if there is none
+
+    The page ID as 32 lowercase hex digits, taken from `page_id` or else
+    from the end of `notion_url`, so a page saved by URL and later
+    backfilled by ID gets the same key. Other IDs are kept as given and
+    URLs without an ID are keyed by the URL minus query and fragment.
+    """
+    if page_id:
+        compact = page_id.replace("-", "").lower()
+        return compact if PAGE_ID.fullmatch(compact) else page_id
+    if notion_url and notion_url.strip():
+        parts = urlsplit(notion_url.strip())
+        match = URL_PAGE_ID.search(parts.path.rstrip("/").lower())
+        if match:
+            return match.group(1).replace("-", "")
+        return f"{parts.scheme}://{parts.netloc}{parts.path}".rstrip("/")
+    return None
+
+
+def content_hash(title: str, content: str, source_db: str, tags: Optional[List[str]] = None) -> str:
+    """Digest of everything a Notion import stores from its page (tag order ignored)"""
+    canonical = json.dumps(
+        [title, content, source_db, sorted(set(tags or []))],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=DIGEST_SIZE).hexdigest()
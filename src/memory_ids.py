@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Time-sortable memory IDs for the Mneme MCP servers
+ULID layout: 48-bit millisecond timestamp + 80-bit randomness, Crockford base32
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+CROCKFORD_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 80
+RANDOM_MAX = (1 << RANDOM_BITS) - 1
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        chars.append(CROCKFORD_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def _random() -> int:
+    # One bit short of 80, to keep headroom for increments within the millisecond
+    return int.from_bytes(os.urandom(10), "big") >> 1
+
+
+def new_ulid(now: Optional[datetime] = None) -> str:
+    """
+    Generate a 26-character ULID
+
+    IDs minted for the current time are strictly increasing within one
+    process: within the same millisecond the random part is incremented
+    instead of redrawn. An explicit `now` (e.g. a page's creation time
+    during a backfill) is encoded as given with fresh randomness, so the
+    ID keeps the memory's own time. Across processes the 80 random bits
+    make collisions negligible.
+    """
+    global _last_ms, _last_random
+    if now is not None:
+        return _encode(int(now.timestamp() * 1000), 10) + _encode(_random(), 16)
+    ms = time.time_ns() // 1_000_000
+    with _lock:
+        if ms <= _last_ms:
+            # Same millisecond (or clock went back): stay monotonic
+            ms = _last_ms
+            if _last_random == RANDOM_MAX:
+                ms += 1
+                _last_random = _random()
+            else:
+                _last_random += 1
+        else:
+            _last_random = _random()
+        _last_ms = ms
+        random_part = _last_random
+    return _encode(ms, 10) + _encode(random_part, 16)
+
+
+def new_memory_id(prefix: str, now: Optional[datetime] = None) -> str:
+    """Memory ID such as notion_01J4Z3K6V0Q9S8X7W2E5R1T3YB"""
+    return f"{prefix}_{new_ulid(now)}"
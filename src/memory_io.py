@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Off-loop execution for the Mneme MCP servers
+Blocking store work runs on I/O threads instead of the asyncio event loop
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable
+
+# Threads serving read-only tool calls
+READ_WORKERS = 4
+
+# Threads serving mutating tool calls; they take turns, so this only
+# bounds how many calls can share one commit group
+WRITE_WORKERS = 16
+
+
+class StoreExecutor:
+    """
+    Dispatches tool bodies to threads so the event loop never blocks
+
+    Mutations run on writer threads that take turns: a call holds the
+    writer turn for its whole body, so mutations are serialized as if
+    there were a single writer. The exception is a strict commit
+    waiting for its group, which hands the turn on (yield_turn) so the
+    next queued calls stage their mutations and join the group; the
+    flush itself runs with the turn taken back, never in the middle of
+    another call's mutations. A writer holds `lock` only while it
+    changes the in-memory state (store.put/index_add/bump_access and
+    the listener updates they trigger) and commits to disk after
+    releasing it. Reads run on a small pool and take `lock` for their
+    whole (short, CPU-only) body. A read therefore sees the state as of
+    the last applied mutation and never waits for a commit's write or
+    fsync, however large.
+
+    Tool functions are plain (synchronous) functions wrapped with
+    reader/writer/blocking; the wrappers are coroutines with the same
+    signature and docstring, so @mcp.tool() registers them as before.
+    """
+
+    def __init__(self, store, read_workers: int = READ_WORKERS,
+                 write_workers: int = WRITE_WORKERS):
+        self.store = store
+        self.lock = threading.RLock()
+        self._turn = threading.Lock()
+        self._local = threading.local()
+        if hasattr(store, "state_lock"):
+            # Commits that must first catch up with another process's
+            # writes rebuild shared state, so they take our lock too
+            store.state_lock = self.lock
+        if hasattr(store, "committer"):
+            store.committer.waiting = self.yield_turn
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="mneme-read")
+        self._writer = ThreadPoolExecutor(max_workers=write_workers, thread_name_prefix="mneme-write")
+
+    # ------------------------------------------------------------------
+    # Thread bodies
+    # ------------------------------------------------------------------
+
+    def _read(self, fn: Callable, args, kwargs):
+        with self.lock:
+            # Skip picking up other processes' changes while our own writer
+            # is committing; the next call will see them
+            self.store.try_refresh()
+            return fn(*args, **kwargs)
+
+    def _write(self, fn: Callable, args, kwargs):
+        with self._turn:
+            self._local.has_turn = True
+            try:
+                with self.lock:
+                    self.store.refresh()
+                return fn(*args, **kwargs)
+            finally:
+                self._local.has_turn = False
+
+    @contextmanager
+    def yield_turn(self):
+        """Let queued writers run while this one waits (no-op off the writer turn)"""
+        if not getattr(self._local, "has_turn", False):
+            yield
+            return
+        self._local.has_turn = False
+        self._turn.release()
+        try:
+            yield
+        finally:
+            self._turn.acquire()
+            self._local.has_turn = True
+
+    @staticmethod
+    async def _await(executor: ThreadPoolExecutor, body: Callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, body, *args)
+
+    # ------------------------------------------------------------------
+    # Tool decorators
+    # ------------------------------------------------------------------
+
+    def reader(self, fn: Callable) -> Callable:
+        """Run a read-only tool on the read pool under the state lock"""
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await self._await(self._readers, self._read, fn, args, kwargs)
+        return wrapper
+
+    def writer(self, fn: Callable) -> Callable:
+        """
+        Run a mutating tool on its writer turn; `fn` must hold `lock`
+        around its in-memory changes and commit outside it
+        """
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await self._await(self._writer, self._write, fn, args, kwargs)
+        return wrapper
+
+    def blocking(self, fn: Callable) -> Callable:
+        """Run blocking work unrelated to the store (own locking) on the read pool"""
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await self._await(self._readers, functools.partial(fn, *args, **kwargs))
+        return wrapper
+
+    def submit_write(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue a mutation without waiting for it (e.g. access-count bumps)"""
+        future = self._writer.submit(self._write, fn, args, kwargs)
+        future.add_done_callback(self._report)
+        return future
+
+    @staticmethod
+    def _report(future: Future):
+        error = future.exception()
+        if error is not None:
+            print(f"Error in background write: {error}")
+
+    def shutdown(self):
+        """Drain queued writes (at exit, before the final flush)"""
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
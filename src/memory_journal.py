@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Append-only write-ahead log for the Mneme memory store
+One JSON record per line; replayed on top of the JSON snapshots
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+class MemoryJournal:
+    """
+    JSONL journal of store mutations
+
+    Record shapes:
+        {"op": "put", "memory": {...}}
+        {"op": "meta", "id": "...", "fields": {...}}
+        {"op": "index_add", "section": "...", "key": "...", "id": "..."}
+        {"op": "index_remove", "section": "...", "key": "...", "id": "..."}
+        {"op": "index_set", "section": "...", "key": "...", "value": ...}
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    @property
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def append(self, records: List[Dict], fsync: bool = True) -> bool:
+        """Append records in a single write"""
+        if not records:
+            return True
+        payload = "".join(
+            json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for record in records
+        )
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(payload)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            return True
+        except Exception as e:
+            print(f"Error appending to journal {self.path}: {e}")
+            return False
+
+    def replay(self, offset: int = 0) -> Tuple[List[Dict], int]:
+        """
+        Read records starting at a byte offset
+
+        Returns the records and the offset just past the last complete
+        line. A torn trailing line (crash mid-append) is cut off so the
+        next append starts on a clean line; a complete line that does not
+        parse is skipped and reported, never dropping the records after it.
+        """
+        records = []
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                end = offset
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError as e:
+                        print(f"Skipping corrupt journal record at byte {end} in {self.path}: {e}")
+                    end += len(line)
+        except FileNotFoundError:
+            return [], 0
+
+        if end < self.size:
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+        return records, end
+
+    def reset(self):
+        """Drop all records (after they were folded into a snapshot)"""
+        with open(self.path, 'w', encoding='utf-8'):
+            pass
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Persistence helpers for the Mneme memory store
+Atomic file replacement, group commit with configurable durability and
+cross-process locking
+"""
+
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+# fcntl is POSIX only; Windows falls back to msvcrt byte-range locks
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Durability modes
+DURABILITY_STRICT = "strict"    # commit() returns after the data is fsync'd
+DURABILITY_RELAXED = "relaxed"  # commit() returns at once; flushed in the background
+
+# The store version is kept as fixed-width decimal at the start of the lock file
+VERSION_WIDTH = 20
+
+# msvcrt locks are mandatory, so lock a byte past the version field
+MSVCRT_LOCK_OFFSET = 64
+
+# Mode given to new files, as open() would (mkstemp always uses 0600)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+NEW_FILE_MODE = 0o666 & ~_UMASK
+
+
+def fsync_directory(directory):
+    """Persist a rename by syncing its directory (no-op where unsupported)"""
+    if os.name == 'nt':
+        return
+    fd = os.open(str(directory), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_file_atomic(file_path, text: str, fsync: bool = True):
+    """
+    Replace a file so that readers see either the old or the new content
+
+    The text goes to a temp file in the same directory which is then
+    renamed over the target; a crash mid-write leaves the old file intact.
+    The target keeps its permissions.
+    """
+    file_path = Path(file_path)
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=f".{file_path.name}.", suffix=".tmp", dir=str(file_path.parent)
+    )
+    try:
+        if hasattr(os, "fchmod"):
+            try:
+                mode = stat.S_IMODE(os.stat(file_path).st_mode)
+            except FileNotFoundError:
+                mode = NEW_FILE_MODE
+            os.fchmod(fd, mode)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    if fsync:
+        fsync_directory(file_path.parent)
+
+
+def save_derived(file_path, header: Dict, payload: Dict):
+    """
+    Persist a derived structure (search index, stats) next to the store
+
+    `header` identifies what the payload was built from (format version,
+    store signature); load_derived() only accepts it back if it matches.
+    Derived files can always be rebuilt, so they are not fsync'd.
+    """
+    write_file_atomic(
+        file_path,
+        json.dumps({**header, **payload}, ensure_ascii=False, separators=(",", ":")),
+        fsync=False
+    )
+
+
+def load_derived(file_path, header: Dict) -> Optional[Dict]:
+    """Data saved by save_derived() if its header matches, else None"""
+    file_path = Path(file_path)
+    if not file_path.exists():
+        return None
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if any(data.get(key) != value for key, value in header.items()):
+        return None
+    return data
+
+
+class GroupCommitter:
+    """
+    Coalesce commit requests into group flushes
+
+    flush() performs the actual write and returns success. Requests
+    arriving within `window` seconds of the first one share a single
+    flush, and with it a single fsync.
+
+    strict:  request() blocks until the group containing it is flushed
+             and returns the flush result.
+    relaxed: request() returns True immediately; a background timer
+             flushes the group once the window closes.
+
+    `waiting` is a context manager factory entered while a strict
+    request waits for its group (the window, or another leader's
+    flush). The server sets it to hand the writer turn to the next
+    queued tool call, so calls that arrive meanwhile stage their
+    mutations and join the group instead of each flushing alone.
+    """
+
+    def __init__(self, flush: Callable[[], bool], window: float = 0.0,
+                 durability: str = DURABILITY_STRICT):
+        if durability not in (DURABILITY_STRICT, DURABILITY_RELAXED):
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self._flush = flush
+        self.window = max(0.0, window)
+        self.durability = durability
+        self._cond = threading.Condition()
+        self._requested = 0     # generation of the latest request
+        self._flushed = 0       # generation covered by the last flush
+        self._last_result = True
+        self._leader = False
+        self._timer = None
+        self.flush_count = 0
+        self.waiting: Callable = nullcontext
+
+    @property
+    def pending(self) -> bool:
+        with self._cond:
+            return self._requested > self._flushed
+
+    def request(self) -> bool:
+        with self._cond:
+            self._requested += 1
+            generation = self._requested
+            if self.durability == DURABILITY_RELAXED:
+                if self._timer is None:
+                    self._timer = threading.Timer(self.window, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return True
+
+        # strict: the first requester leads the group, later ones wait
+        with self.waiting():
+            with self._cond:
+                while self._leader and self._flushed < generation:
+                    self._cond.wait()
+                if self._flushed >= generation:
+                    return self._last_result
+                self._leader = True
+
+        try:
+            if self.window:
+                with self.waiting():
+                    time.sleep(self.window)
+            return self.flush()
+        finally:
+            with self._cond:
+                self._leader = False
+                self._cond.notify_all()
+
+    def flush(self) -> bool:
+        """Flush everything requested so far (also used at shutdown)"""
+        with self._cond:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            generation = self._requested
+            if self._flushed >= generation:
+                return self._last_result
+        result = self._flush()
+        with self._cond:
+            self.flush_count += 1
+            self._last_result = result
+            if result:
+                self._flushed = max(self._flushed, generation)
+            self._cond.notify_all()
+        return result
+
+
+class StoreLock:
+    """
+    Advisory reader/writer lock and commit version shared by processes
+
+    Readers (load, refresh) hold the lock shared and writers (commit,
+    compaction) exclusive, through fcntl.flock on one lock file in the
+    data directory. Windows only has exclusive msvcrt locks, so there
+    both modes exclude each other. Acquisitions nest: an inner acquire()
+    while the lock is held only counts, so callers must serialize their
+    own threads (MemoryStore takes it under its RLock). A shared hold
+    cannot be upgraded to exclusive.
+
+    The lock file's content is the store version, a counter each writer
+    bumps before releasing the exclusive lock. A process that remembers
+    the version it last loaded or wrote can tell, once it holds the lock,
+    whether another process committed in the meantime.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        self._depth = 0
+        self._exclusive = False
+        # Version I/O moves the shared file position
+        self._io_lock = threading.Lock()
+
+    @property
+    def held(self) -> bool:
+        return self._depth > 0
+
+    def acquire(self, exclusive: bool = False, blocking: bool = True) -> bool:
+        """Take the lock; False only if `blocking` is off and it is taken"""
+        if self._depth:
+            if exclusive and not self._exclusive:
+                raise RuntimeError("Cannot upgrade a shared store lock to exclusive")
+            self._depth += 1
+            return True
+        if not self._lock(exclusive, blocking):
+            return False
+        self._depth = 1
+        self._exclusive = exclusive
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self._unlock()
+
+    def _lock(self, exclusive: bool, blocking: bool) -> bool:
+        if fcntl is not None:
+            flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            try:
+                fcntl.flock(self._fd, flags if blocking else flags | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            return True
+        while True:
+            with self._io_lock:
+                os.lseek(self._fd, MSVCRT_LOCK_OFFSET, os.SEEK_SET)
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+                    return True
+                except OSError:
+                    pass
+            if not blocking:
+                return False
+            time.sleep(0.01)
+
+    def _unlock(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            return
+        with self._io_lock:
+            os.lseek(self._fd, MSVCRT_LOCK_OFFSET, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    @contextmanager
+    def shared(self):
+        self.acquire(exclusive=False)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def exclusive(self):
+        self.acquire(exclusive=True)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def version(self) -> int:
+        """Number of commits recorded in the lock file (0 for a new store)"""
+        with self._io_lock:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            data = os.read(self._fd, VERSION_WIDTH)
+        try:
+            return int(data)
+        except ValueError:
+            return 0
+
+    def bump(self) -> int:
+        """Record one more commit; only call while holding the lock exclusively"""
+        version = self.version() + 1
+        with self._io_lock:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            os.write(self._fd, b"%0*d" % (VERSION_WIDTH, version))
+        return version
+
+    def close(self):
+        os.close(self._fd)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Weighted sampling for the Mneme memory store
+Aging-biased random draws in O(log n) from Fenwick trees
+"""
+
+import random
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from memory_columns import MetadataColumns
+from memory_time import MS_PER_DAY, timestamp_ms
+
+SECONDS_PER_DAY = 86400.0
+
+
+class FenwickTree:
+    """Prefix sums over a growable array of floats"""
+
+    def __init__(self, capacity: int = 16):
+        self.tree = [0.0] * (capacity + 1)
+
+    def __len__(self):
+        return len(self.tree) - 1
+
+    def add(self, position: int, delta: float):
+        i = position + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    @classmethod
+    def build(cls, values: List[float], capacity: int) -> "FenwickTree":
+        """O(n) construction"""
+        tree = cls(capacity)
+        tree.tree[1:len(values) + 1] = values
+        for i in range(1, len(tree.tree)):
+            parent = i + (i & -i)
+            if parent < len(tree.tree):
+                tree.tree[parent] += tree.tree[i]
+        return tree
+
+
+class AgingPartition:
+    """
+    One sampling population (all memories, or one memory type)
+
+    Every slot carries (count, day_sum, constant) so that its weight is
+
+        weight(now) = count * (now_days + 1) - day_sum + constant
+
+    i.e. days_old + 1 for a memory created at day_sum, and a flat 1 for
+    memories without a usable timestamp. The weight is affine in "now",
+    so three Fenwick trees over these components stay valid forever and
+    a draw is one O(log n) descent evaluated at the current time.
+    """
+
+    def __init__(self):
+        self.ids: List[Optional[str]] = []
+        self.positions: Dict[str, int] = {}
+        self.components: List[Tuple[float, float, float]] = []
+        self.count = FenwickTree()
+        self.day_sum = FenwickTree()
+        self.constant = FenwickTree()
+        self.size = 0
+
+    def _grow(self):
+        if len(self.ids) > 2 * self.size:
+            # Mostly emptied slots (replaced memories): compact instead of growing
+            live = [i for i, memory_id in enumerate(self.ids) if memory_id is not None]
+            self.ids = [self.ids[i] for i in live]
+            self.components = [self.components[i] for i in live]
+            self.positions = {memory_id: i for i, memory_id in enumerate(self.ids)}
+        capacity = max(16, 2 * len(self.ids))
+        columns = list(zip(*self.components)) if self.components else ([], [], [])
+        self.count = FenwickTree.build(list(columns[0]), capacity)
+        self.day_sum = FenwickTree.build(list(columns[1]), capacity)
+        self.constant = FenwickTree.build(list(columns[2]), capacity)
+
+    @staticmethod
+    def _component(created_days: Optional[float], now_days: float) -> Tuple[float, float, float]:
+        if created_days is None:
+            return (0.0, 0.0, 1.0)
+        # Memories stamped in the future (clock skew) count as brand new
+        return (1.0, min(created_days, now_days), 0.0)
+
+    def load(self, entries: List[Tuple[str, Optional[float]]], now_days: float):
+        """Bulk (re)initialization in O(n)"""
+        self.ids = [memory_id for memory_id, _ in entries]
+        self.components = [self._component(created, now_days) for _, created in entries]
+        self.positions = {memory_id: i for i, memory_id in enumerate(self.ids)}
+        self.size = len(self.ids)
+        self._grow()
+
+    def add(self, memory_id: str, created_days: Optional[float], now_days: float):
+        self.remove(memory_id)
+        component = self._component(created_days, now_days)
+        if len(self.ids) >= len(self.count):
+            self._grow()
+        position = len(self.ids)
+        self.ids.append(memory_id)
+        self.components.append(component)
+        self.positions[memory_id] = position
+        self.count.add(position, component[0])
+        self.day_sum.add(position, component[1])
+        self.constant.add(position, component[2])
+        self.size += 1
+
+    def remove(self, memory_id: str):
+        position = self.positions.pop(memory_id, None)
+        if position is None:
+            return
+        self._set_component(position, (0.0, 0.0, 0.0))
+        self.ids[position] = None
+        self.size -= 1
+
+    def _set_component(self, position: int, component: Tuple[float, float, float]):
+        old = self.components[position]
+        self.count.add(position, component[0] - old[0])
+        self.day_sum.add(position, component[1] - old[1])
+        self.constant.add(position, component[2] - old[2])
+        self.components[position] = component
+
+    def suspend(self, memory_id: str) -> Tuple[float, float, float]:
+        """Give a memory zero weight (for draws without replacement)"""
+        position = self.positions[memory_id]
+        component = self.components[position]
+        self._set_component(position, (0.0, 0.0, 0.0))
+        self.size -= 1
+        return component
+
+    def resume(self, memory_id: str, component: Tuple[float, float, float]):
+        """Undo suspend()"""
+        self._set_component(self.positions[memory_id], component)
+        self.size += 1
+
+    def total_weight(self, now_days: float) -> float:
+        return self._node_weight(len(self.count), now_days, prefix=True)
+
+    def _node_weight(self, i: int, now_days: float, prefix: bool = False) -> float:
+        if prefix:
+            count = day_sum = constant = 0.0
+            while i > 0:
+                count += self.count.tree[i]
+                day_sum += self.day_sum.tree[i]
+                constant += self.constant.tree[i]
+                i -= i & -i
+        else:
+            count = self.count.tree[i]
+            day_sum = self.day_sum.tree[i]
+            constant = self.constant.tree[i]
+        return count * (now_days + 1) - day_sum + constant
+
+    def sample(self, now_days: float, rng: random.Random) -> Optional[str]:
+        """Draw one memory ID with probability proportional to its weight"""
+        if not self.size:
+            return None
+        target = rng.random() * self.total_weight(now_days)
+        position = 0
+        step = 1 << (len(self.count).bit_length() - 1)
+        while step:
+            nxt = position + step
+            if nxt <= len(self.count):
+                weight = self._node_weight(nxt, now_days)
+                if weight <= target:
+                    target -= weight
+                    position = nxt
+            step >>= 1
+        # Float drift can land on an emptied slot; fall back to the nearest live one
+        def live(i):
+            return self.ids[i] is not None and any(self.components[i])
+        for candidate in range(min(position, len(self.ids) - 1), -1, -1):
+            if live(candidate):
+                return self.ids[candidate]
+        return next(self.ids[i] for i in range(len(self.ids)) if live(i))
+
+
+class AgingSampler:
+    """
+    Aging-biased sampler over the memory store (MemoryStore listener)
+
+    Keeps one partition for all memories and one per memory type, so
+    draws filtered by type are O(log n) as well.
+    """
+
+    # Only metadata is needed; the store skips loading content for us
+    needs_content = False
+
+    def __init__(self, rng: Optional[random.Random] = None,
+                 columns: Optional[MetadataColumns] = None):
+        self.rng = rng or random.Random()
+        self.columns = columns
+        self.clear()
+
+    def clear(self):
+        self.everything = AgingPartition()
+        self.by_type: Dict[str, AgingPartition] = {}
+        self.created: Dict[str, Optional[float]] = {}
+        self.types: Dict[str, str] = {}
+
+    @staticmethod
+    def now_days() -> float:
+        return time.time() / SECONDS_PER_DAY
+
+    def _created_days(self, memory_id: str, memory: Dict) -> Optional[float]:
+        """Creation time in fractional Unix days, from the store's table if given"""
+        if self.columns is not None:
+            epoch_ms = self.columns.epoch_ms(memory_id)
+        else:
+            epoch_ms = timestamp_ms(memory)
+        return epoch_ms / MS_PER_DAY if epoch_ms is not None else None
+
+    # ------------------------------------------------------------------
+    # Listener protocol
+    # ------------------------------------------------------------------
+
+    def rebuild(self, items: Iterable[Tuple[str, Dict]]):
+        self.clear()
+        now_days = self.now_days()
+        everything = []
+        by_type: Dict[str, List[Tuple[str, Optional[float]]]] = {}
+        for memory_id, memory in items:
+            created_days = self._created_days(memory_id, memory)
+            memory_type = memory.get("type", "unknown")
+            everything.append((memory_id, created_days))
+            by_type.setdefault(memory_type, []).append((memory_id, created_days))
+            self.created[memory_id] = created_days
+            self.types[memory_id] = memory_type
+        self.everything.load(everything, now_days)
+        for memory_type, entries in by_type.items():
+            self.by_type[memory_type] = AgingPartition()
+            self.by_type[memory_type].load(entries, now_days)
+
+    def add(self, memory_id: str, memory: Dict):
+        self.remove(memory_id)
+        now_days = self.now_days()
+        created_days = self._created_days(memory_id, memory)
+        memory_type = memory.get("type", "unknown")
+        self.everything.add(memory_id, created_days, now_days)
+        self.by_type.setdefault(memory_type, AgingPartition()).add(memory_id, created_days, now_days)
+        self.created[memory_id] = created_days
+        self.types[memory_id] = memory_type
+
+    def remove(self, memory_id: str):
+        if memory_id not in self.types:
+            return
+        self.everything.remove(memory_id)
+        self.by_type[self.types.pop(memory_id)].remove(memory_id)
+        del self.created[memory_id]
+
+    # ------------------------------------------------------------------
+    # Draws
+    # ------------------------------------------------------------------
+
+    def sample(self, memory_type: Optional[str] = None) -> Optional[Tuple[str, int]]:
+        """Draw (memory_id, days_old); None if the population is empty"""
+        partition = self.everything if memory_type is None else self.by_type.get(memory_type)
+        if partition is None:
+            return None
+        now_days = self.now_days()
+        memory_id = partition.sample(now_days, self.rng)
+        if memory_id is None:
+            return None
+        return memory_id, self._days_old(memory_id, now_days)
+
+    def _days_old(self, memory_id: str, now_days: float) -> int:
+        created_days = self.created[memory_id]
+        return int(now_days - created_days) if created_days is not None else 0
+
+    def sample_many(self, count: int, memory_types: Optional[List[str]] = None,
+                    without_replacement: bool = True) -> List[Tuple[str, int]]:
+        """
+        Draw `count` (memory_id, days_old) pairs in one pass
+
+        With memory_types the population is the union of those types: each
+        draw first picks a type in proportion to its total weight, then a
+        memory within it. Without replacement, drawn memories get zero
+        weight until the batch is complete (so at most the population
+        size is returned).
+        """
+        if memory_types is None:
+            partitions = [self.everything]
+        else:
+            partitions = [
+                self.by_type[memory_type] for memory_type in dict.fromkeys(memory_types)
+                if memory_type in self.by_type
+            ]
+        now_days = self.now_days()
+        drawn: List[Tuple[str, int]] = []
+        suspended = []
+        try:
+            for _ in range(max(0, count)):
+                totals = [p.total_weight(now_days) if p.size else 0.0 for p in partitions]
+                if not any(total > 0 for total in totals):
+                    break
+                partition = self.rng.choices(partitions, weights=totals)[0]
+                memory_id = partition.sample(now_days, self.rng)
+                drawn.append((memory_id, self._days_old(memory_id, now_days)))
+                if without_replacement:
+                    suspended.append((partition, memory_id, partition.suspend(memory_id)))
+        finally:
+            for partition, memory_id, component in reversed(suspended):
+                partition.resume(memory_id, component)
+        return drawn
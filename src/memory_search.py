@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Search indexes for the Mneme memory store
+Inverted index over memory content with BM25 ranking
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from memory_persistence import load_derived, save_derived
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Score added per query term that matches one of a memory's tags
+TAG_BOOST = 2.0
+
+# Runs of Han, kana and Hangul characters (written without spaces) and
+# everything else that counts as a word
+TOKEN_PATTERN = re.compile(
+    r"([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af\u3005]+)|(\w+)"
+)
+
+# Bump when tokenization changes so persisted indexes get rebuilt
+INDEX_FORMAT_VERSION = 2
+
+
+class CJKTokenizer:
+    """
+    Word tokens for spaced scripts, character n-grams for CJK runs
+
+    Text is NFKC-normalized (full-width Latin, half-width kana) and
+    lowercased. A CJK run is split into overlapping n-grams; documents
+    additionally index single characters so one-character queries still
+    hit, while queries use only n-grams to stay selective.
+    """
+
+    def __init__(self, n: int = 2):
+        if n < 2:
+            raise ValueError("CJK n-gram size must be at least 2")
+        self.n = n
+        self.name = f"cjk{n}"
+
+    def __call__(self, text: str, query: bool = False) -> List[str]:
+        text = unicodedata.normalize("NFKC", text).lower()
+        tokens = []
+        for cjk_run, word in TOKEN_PATTERN.findall(text):
+            if word:
+                tokens.append(word)
+                continue
+            if len(cjk_run) <= self.n:
+                tokens.append(cjk_run)
+            else:
+                tokens.extend(cjk_run[i:i + self.n] for i in range(len(cjk_run) - self.n + 1))
+            if not query and len(cjk_run) > 1:
+                tokens.extend(cjk_run)
+        return tokens
+
+
+# Default tokenizer stage; any callable (text, query=False) -> tokens works
+tokenize = CJKTokenizer(2)
+
+
+def content_text(value) -> str:
+    """Concatenate the string values of a content structure (keys are skipped)"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return " ".join(content_text(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return " ".join(content_text(v) for v in value)
+    return ""
+
+
+class InvertedIndex:
+    """
+    term -> {memory_id: term frequency} postings, scored with BM25
+
+    Kept current through the MemoryStore listener protocol (rebuild/add/
+    remove), so a query only walks the posting lists of its own terms.
+    Tags get their own postings and add TAG_BOOST per matching term.
+
+    The tokenizer is pluggable. With a persist path the postings are
+    saved by persist() together with the store signature they reflect;
+    restore() reloads them at startup instead of re-tokenizing the whole
+    corpus, as long as the signature still matches.
+    """
+
+    def __init__(self, tokenizer: Callable[..., List[str]] = tokenize,
+                 persist_path: Optional[Path] = None):
+        self.tokenizer = tokenizer
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.clear()
+
+    def clear(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.tag_postings: Dict[str, set] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.doc_terms: Dict[str, Tuple[List[str], List[str]]] = {}
+        self.total_length = 0
+
+    # ------------------------------------------------------------------
+    # Listener protocol
+    # ------------------------------------------------------------------
+
+    def rebuild(self, items: Iterable[Tuple[str, Dict]]):
+        self.clear()
+        for memory_id, memory in items:
+            self.add(memory_id, memory)
+
+    def add(self, memory_id: str, memory: Dict):
+        if memory_id in self.doc_lengths:
+            self.remove(memory_id)
+        tokens = self.tokenizer(content_text(memory.get("content", {})))
+        frequencies: Dict[str, int] = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        for term, tf in frequencies.items():
+            self.postings.setdefault(term, {})[memory_id] = tf
+
+        tag_terms = set()
+        for tag in memory.get("metadata", {}).get("tags", []) or []:
+            tag_terms.update(self.tokenizer(tag))
+        for term in tag_terms:
+            self.tag_postings.setdefault(term, set()).add(memory_id)
+
+        self.doc_lengths[memory_id] = len(tokens)
+        self.doc_terms[memory_id] = (list(frequencies), list(tag_terms))
+        self.total_length += len(tokens)
+
+    def remove(self, memory_id: str):
+        if memory_id not in self.doc_lengths:
+            return
+        terms, tag_terms = self.doc_terms.pop(memory_id)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(memory_id, None)
+                if not posting:
+                    del self.postings[term]
+        for term in tag_terms:
+            members = self.tag_postings.get(term)
+            if members is not None:
+                members.discard(memory_id)
+                if not members:
+                    del self.tag_postings[term]
+        self.total_length -= self.doc_lengths.pop(memory_id)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _header(self, signature) -> Dict:
+        return {
+            "version": INDEX_FORMAT_VERSION,
+            "tokenizer": getattr(self.tokenizer, "name", repr(self.tokenizer)),
+            "signature": signature,
+        }
+
+    def persist(self, signature) -> bool:
+        """Save the postings as reflecting the store state `signature`"""
+        if self.persist_path is None:
+            return False
+        payload = {
+            "postings": self.postings,
+            "tag_postings": {term: sorted(ids) for term, ids in self.tag_postings.items()},
+            "doc_lengths": self.doc_lengths,
+        }
+        try:
+            save_derived(self.persist_path, self._header(signature), payload)
+            return True
+        except Exception as e:
+            print(f"Error saving search index to {self.persist_path}: {e}")
+            return False
+
+    def restore(self, signature) -> bool:
+        """Load persisted postings if they match `signature`; False means rebuild"""
+        if self.persist_path is None:
+            return False
+        data = load_derived(self.persist_path, self._header(signature))
+        if data is None:
+            return False
+
+        self.clear()
+        self.postings = data["postings"]
+        self.tag_postings = {term: set(ids) for term, ids in data["tag_postings"].items()}
+        self.doc_lengths = data["doc_lengths"]
+        self.total_length = sum(self.doc_lengths.values())
+        terms: Dict[str, List[str]] = {memory_id: [] for memory_id in self.doc_lengths}
+        tag_terms: Dict[str, List[str]] = {memory_id: [] for memory_id in self.doc_lengths}
+        for term, posting in self.postings.items():
+            for memory_id in posting:
+                terms[memory_id].append(term)
+        for term, ids in self.tag_postings.items():
+            for memory_id in ids:
+                tag_terms[memory_id].append(term)
+        self.doc_terms = {
+            memory_id: (terms[memory_id], tag_terms[memory_id]) for memory_id in self.doc_lengths
+        }
+        return True
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def idf(self, term: str) -> float:
+        """BM25 inverse document frequency of a term (highest for unseen terms)"""
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.doc_lengths) - df + 0.5) / (df + 0.5))
+
+    def score(self, query: str) -> Dict[str, float]:
+        """BM25 (+ tag boost) score of every memory matching any query term"""
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return {}
+        avg_length = self.total_length / n_docs or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(self.tokenizer(query, query=True)):
+            posting = self.postings.get(term, {})
+            if posting:
+                idf = self.idf(term)
+                for memory_id, tf in posting.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[memory_id] / avg_length)
+                    scores[memory_id] = scores.get(memory_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+            for memory_id in self.tag_postings.get(term, ()):
+                scores[memory_id] = scores.get(memory_id, 0.0) + TAG_BOOST
+        return scores
+
+    def search(self, query: str, limit: int = 5,
+               accept: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float]]:
+        """Top `limit` (memory_id, score) pairs, best first, among IDs passing `accept`"""
+        scores = self.score(query).items()
+        if accept is not None:
+            scores = [(memory_id, score) for memory_id, score in scores if accept(memory_id)]
+        return heapq.nlargest(limit, scores, key=lambda item: item[1])
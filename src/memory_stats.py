@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Running statistics for the Mneme memory store
+Counts, time span and sizes maintained per insert/delete instead of per query
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from memory_persistence import load_derived, save_derived
+from memory_columns import MetadataColumns, source_db
+from memory_time import timestamp_ms
+
+# Bump when the persisted entry layout changes so stale files get rebuilt
+STATS_FORMAT_VERSION = 2
+
+
+def content_size(memory: Dict) -> int:
+    """UTF-8 size of a memory's content in its compact JSON form"""
+    content = memory.get("content", {})
+    return len(json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode('utf-8'))
+
+
+def _count(counts: Dict[str, int], key: str, delta: int):
+    value = counts.get(key, 0) + delta
+    if value:
+        counts[key] = value
+    else:
+        del counts[key]
+
+
+class MemoryStats:
+    """
+    Aggregate statistics over the memory store (MemoryStore listener)
+
+    Each memory contributes one small entry (type, creation time in epoch
+    milliseconds, content size, tags, topics, Notion source); the
+    aggregates are reference counts over those entries, so
+    get_memory_stats reads them in O(1).
+    Oldest/newest are kept as running bounds and only rescanned when the
+    memory holding one of them is removed or replaced.
+
+    With a persist path the entries are saved by persist() next to the
+    store signature they reflect and reloaded by restore(), like the
+    search index. Creation times come from the store's MetadataColumns
+    when given.
+    """
+
+    def __init__(self, persist_path: Optional[Path] = None,
+                 columns: Optional[MetadataColumns] = None):
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.columns = columns
+        self.clear()
+
+    def clear(self):
+        self.entries: Dict[str, Tuple] = {}
+        self.type_counts: Dict[str, int] = {}
+        self.tag_counts: Dict[str, int] = {}
+        self.topic_counts: Dict[str, int] = {}
+        self.source_counts: Dict[str, int] = {}
+        self.total_bytes = 0
+        self.oldest: Optional[int] = None
+        self.newest: Optional[int] = None
+        self._bounds_stale = False
+
+    def entry(self, memory_id: str, memory: Dict) -> Tuple:
+        """(type, epoch_ms, size, tags, topics, source) summary of one memory"""
+        if self.columns is not None:
+            epoch_ms = self.columns.epoch_ms(memory_id)
+        else:
+            epoch_ms = timestamp_ms(memory)
+        metadata = memory.get("metadata", {})
+        content = memory.get("content", {})
+        topics = content.get("topics", []) if isinstance(content, dict) else []
+        return (
+            memory.get("type", "unknown"),
+            epoch_ms,
+            content_size(memory),
+            list(dict.fromkeys(metadata.get("tags", []) or [])),
+            list(dict.fromkeys(topics or [])),
+            source_db(memory),
+        )
+
+    # ------------------------------------------------------------------
+    # Listener protocol
+    # ------------------------------------------------------------------
+
+    def rebuild(self, items: Iterable[Tuple[str, Dict]]):
+        self.clear()
+        for memory_id, memory in items:
+            self._apply(memory_id, self.entry(memory_id, memory), 1)
+
+    def add(self, memory_id: str, memory: Dict):
+        self.remove(memory_id)
+        self._apply(memory_id, self.entry(memory_id, memory), 1)
+
+    def remove(self, memory_id: str):
+        entry = self.entries.get(memory_id)
+        if entry is not None:
+            self._apply(memory_id, entry, -1)
+
+    def _apply(self, memory_id: str, entry: Tuple, delta: int):
+        memory_type, epoch, size, tags, topics, source = entry
+        if delta > 0:
+            self.entries[memory_id] = entry
+        else:
+            del self.entries[memory_id]
+        _count(self.type_counts, memory_type, delta)
+        for tag in tags:
+            _count(self.tag_counts, tag, delta)
+        for topic in topics:
+            _count(self.topic_counts, topic, delta)
+        if source is not None:
+            _count(self.source_counts, source, delta)
+        self.total_bytes += delta * size
+
+        if epoch is None:
+            return
+        if delta > 0:
+            if not self._bounds_stale:
+                self.oldest = epoch if self.oldest is None else min(self.oldest, epoch)
+                self.newest = epoch if self.newest is None else max(self.newest, epoch)
+        elif epoch in (self.oldest, self.newest):
+            self._bounds_stale = True
+
+    def _time_bounds(self) -> Tuple[Optional[int], Optional[int]]:
+        if self._bounds_stale:
+            epochs = [entry[1] for entry in self.entries.values() if entry[1] is not None]
+            self.oldest = min(epochs) if epochs else None
+            self.newest = max(epochs) if epochs else None
+            self._bounds_stale = False
+        return self.oldest, self.newest
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _header(self, signature) -> Dict:
+        return {"version": STATS_FORMAT_VERSION, "signature": signature}
+
+    def persist(self, signature) -> bool:
+        """Save the per-memory entries as reflecting the store state `signature`"""
+        if self.persist_path is None:
+            return False
+        try:
+            save_derived(self.persist_path, self._header(signature), {"entries": self.entries})
+            return True
+        except Exception as e:
+            print(f"Error saving memory stats to {self.persist_path}: {e}")
+            return False
+
+    def restore(self, signature) -> bool:
+        """Load persisted entries if they match `signature`; False means rebuild"""
+        if self.persist_path is None:
+            return False
+        data = load_derived(self.persist_path, self._header(signature))
+        if data is None:
+            return False
+        self.clear()
+        for memory_id, entry in data["entries"].items():
+            self._apply(memory_id, tuple(entry), 1)
+        return True
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def summary(self) -> Dict:
+        """Aggregates in the shape reported by get_memory_stats"""
+        oldest, newest = self._time_bounds()
+        return {
+            "total_memories": len(self.entries),
+            "type_distribution": dict(self.type_counts),
+            "total_tags": len(self.tag_counts),
+            "total_topics": len(self.topic_counts),
+            "notion_sources": len(self.source_counts),
+            "total_bytes": self.total_bytes,
+            "oldest_ms": oldest,
+            "newest_ms": newest,
+        }
+
+    def differences(self, other: "MemoryStats") -> List[str]:
+        """Names of summary fields that disagree with `other`"""
+        mine, theirs = self.summary(), other.summary()
+        return [key for key in mine if mine[key] != theirs[key]]
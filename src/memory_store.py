@@ -0,0 +1,763 @@
+#!/usr/bin/env python3
+"""
+Resident memory store for the Mneme MCP servers
+Loads memories.json/index.json once and serves every tool from RAM
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from memory_bodies import BodyCache, BodyStore
+from memory_journal import MemoryJournal
+from memory_persistence import DURABILITY_STRICT, GroupCommitter, StoreLock, write_file_atomic
+from memory_columns import MetadataColumns
+from memory_time import normalize_timestamp
+
+# Journal modes
+JOURNAL_OFF = "off"   # rewrite memories.json/index.json on every commit
+JOURNAL_WAL = "wal"   # append mutations to memories.wal, compact periodically
+
+# The journal is folded into the snapshots once it outgrows them, and in
+# split layout the body file is rewritten once replaced bodies outweigh
+# the live ones (neither before this many bytes), which keeps the
+# amortized cost of a write independent of the store size.
+MIN_COMPACT_BYTES = 4 * 1024 * 1024
+
+# Access counts are folded into the main records once their sidecar log
+# grows past this size
+ACCESS_FOLD_BYTES = 256 * 1024
+
+# Storage layouts
+LAYOUT_INLINE = "inline"  # full records (content included) in memories.json
+LAYOUT_SPLIT = "split"    # metadata in memories_meta.json, content in memory_bodies.jsonl
+
+
+def load_json(file_path):
+    """Load JSON file with error handling"""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+            return data if isinstance(data, dict) else {}
+    except (json.JSONDecodeError, FileNotFoundError):
+        return {}
+
+
+def load_snapshot(file_path):
+    """
+    Load a store snapshot, refusing to treat a corrupt file as empty
+
+    Returning {} for a damaged memories.json would let the next save
+    overwrite the whole store with nothing.
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except FileNotFoundError:
+        return {}
+    if not text.strip():
+        return {}
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{file_path} is corrupt ({e}); refusing to load it") from e
+    if not isinstance(data, dict):
+        raise ValueError(f"{file_path} does not contain a JSON object")
+    return data
+
+
+def save_json(file_path, data, fsync=True):
+    """Save to JSON file atomically (temp file + rename) with error handling"""
+    try:
+        write_file_atomic(file_path, json.dumps(data, ensure_ascii=False, indent=2), fsync=fsync)
+        return True
+    except Exception as e:
+        print(f"Error saving JSON to {file_path}: {e}")
+        return False
+
+
+def file_signature(file_path) -> Optional[Tuple[int, int]]:
+    """Return (mtime_ns, size) of a file, or None if it does not exist"""
+    try:
+        stat = Path(file_path).stat()
+        return (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        return None
+
+
+class MemoryStore:
+    """
+    In-process memory store
+
+    Memories and the index are parsed once and kept resident. Mutations
+    only touch RAM and mark the affected file dirty; commit() writes the
+    dirty files back. refresh() compares file signatures (mtime/size)
+    against the last load or commit and reloads only when another process
+    changed the files.
+
+    In "wal" journal mode commit() appends the pending mutations to
+    memories.wal instead of rewriting the snapshots; load() replays the
+    journal on top of memories.json/index.json and compact() folds it back.
+
+    Commits go through a GroupCommitter: requests within
+    `group_commit_window` seconds share one write and one fsync, and
+    `durability` decides whether commit() waits for it (strict) or
+    returns immediately (relaxed).
+
+    Derived structures (search indexes, samplers, ...) register with
+    add_listener() and are kept current through rebuild(items),
+    add(memory_id, memory) and remove(memory_id) callbacks. Listeners
+    that set needs_content = False are rebuilt from metadata_items().
+
+    Access counts never dirty the main store: bump_access() updates the
+    resident record and appends the new absolute count to the
+    access_counts.jsonl sidecar, which is replayed on load (last value
+    wins, so replays are idempotent) and folded into the main records
+    whenever memories.json is written anyway or the sidecar outgrows
+    ACCESS_FOLD_BYTES.
+
+    In "split" layout only compact metadata records stay resident; each
+    record's "content" is replaced by a {"offset", "length"} reference
+    into the append-only body store and is read back lazily by get() and
+    items(). metadata_items() never touches the bodies. Bodies read by
+    get() stay in an LRU cache of `body_cache_size` entries (and at most
+    `body_cache_bytes` if non-zero); items() scans bypass it. Replaced
+    bodies stay in the file until compact() rewrites it with only the
+    live ones, which a commit triggers once they outweigh the live ones.
+
+    Scalar metadata (creation time parsed once, type, source, importance,
+    access_count) is kept in `columns`, a MetadataColumns table
+    registered as the first listener, so time-based weighting,
+    statistics and filters never re-parse ISO strings. Legacy naive
+    timestamps are normalized to UTC on load and written back with the
+    next commit.
+
+    Several processes may share one data directory. Reads from disk
+    (load, refresh) hold a StoreLock shared and every write holds it
+    exclusively, so nobody reads half-appended logs. Each write bumps the
+    store version kept in the lock file; a commit that finds the version
+    (or a file signature) changed since our last load first reloads and
+    re-applies its pending mutations and access-count increments on top
+    (optimistic concurrency), so concurrent writers never lose each
+    other's updates. Catching up rebuilds the listeners, so it runs under
+    `state_lock` as well, the lock callers hold while reading them.
+    """
+
+    def __init__(self, data_dir, journal_mode: str = JOURNAL_OFF,
+                 durability: str = DURABILITY_STRICT, group_commit_window: float = 0.0,
+                 layout: str = LAYOUT_INLINE, body_cache_size: int = 1000,
+                 body_cache_bytes: int = 0):
+        if journal_mode not in (JOURNAL_OFF, JOURNAL_WAL):
+            raise ValueError(f"Unknown journal mode: {journal_mode}")
+        if layout not in (LAYOUT_INLINE, LAYOUT_SPLIT):
+            raise ValueError(f"Unknown storage layout: {layout}")
+        self.data_dir = Path(data_dir)
+        self.layout = layout
+        self.bodies: Optional[BodyStore] = None
+        self._body_compact_at = 0
+        if layout == LAYOUT_SPLIT:
+            self.memories_file = self.data_dir / "memories_meta.json"
+            self.bodies = BodyStore(
+                self.data_dir / "memory_bodies.jsonl",
+                cache=BodyCache(body_cache_size, body_cache_bytes)
+            )
+        else:
+            self.memories_file = self.data_dir / "memories.json"
+        self.index_file = self.data_dir / "index.json"
+        self.journal_mode = journal_mode
+        self.journal = MemoryJournal(self.data_dir / "memories.wal")
+        self.access_log = MemoryJournal(self.data_dir / "access_counts.jsonl")
+        self.memories: Dict[str, Dict] = {}
+        self.index: Dict[str, Dict] = {}
+        self._signatures: Dict[Path, Optional[Tuple[int, int]]] = {}
+        self._dirty = set()
+        self._pending: List[Dict] = []
+        self._journal_offset = 0
+        self._pending_access: Dict[str, int] = {}
+        self._access_offset = 0
+        self._access_ids = set()
+        self._lock = threading.RLock()
+        self.state_lock = self._lock
+        self.file_lock = StoreLock(self.data_dir / ".mneme.lock")
+        self._version = 0
+        self.columns = MetadataColumns()
+        self._listeners: List = [self.columns]
+        self.committer = GroupCommitter(self._flush, group_commit_window, durability)
+        self.load()
+
+    def add_listener(self, listener):
+        """
+        Register a derived structure and build it from the current contents
+
+        A listener with a restore(signature) method may load a persisted
+        copy instead, provided it was saved at the same store signature().
+        """
+        self._listeners.append(listener)
+        restore = getattr(listener, "restore", None)
+        if not (restore and restore(self.signature())):
+            listener.rebuild(self._listener_items(listener))
+
+    def _listener_items(self, listener):
+        """Listeners declaring needs_content = False are fed metadata only"""
+        if getattr(listener, "needs_content", True):
+            return self.items()
+        return self.metadata_items()
+
+    def signature(self) -> List:
+        """JSON-serializable fingerprint of the persisted store contents"""
+        return [
+            list(file_signature(path) or ())
+            for path in (self.memories_file, self.journal.path)
+        ]
+
+    def _notify_rebuild(self):
+        for listener in self._listeners:
+            listener.rebuild(self._listener_items(listener))
+
+    def _notify_add(self, memory_id: str, memory: Dict):
+        for listener in self._listeners:
+            listener.add(memory_id, memory)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def load(self):
+        """(Re)load memories and index from disk"""
+        with self._lock:
+            if self.bodies is not None:
+                if not self.memories_file.exists():
+                    self._migrate_to_split()
+                self._finish_body_compaction()
+            with self.file_lock.shared():
+                if self.bodies is not None and self.bodies.replaced():
+                    self.bodies.reopen()
+                self.memories = load_snapshot(self.memories_file)
+                self.index = load_snapshot(self.index_file)
+                self._dirty.clear()
+                self._pending.clear()
+                self._pending_access.clear()
+                self._access_ids.clear()
+                self._journal_offset = 0
+                self._access_offset = 0
+                # A journal left behind in "off" mode is still replayed so that
+                # switching modes never drops records.
+                self._replay_journal()
+                self._replay_access_log()
+                self._version = self.file_lock.version()
+                self._remember_signatures()
+            self._normalize_timestamps()
+            self._notify_rebuild()
+
+    def _normalize_timestamps(self):
+        """Stage naive (local time) timestamps of legacy records as UTC"""
+        for record in self.memories.values():
+            if normalize_timestamp(record):
+                self._dirty.add(self.memories_file)
+                self._pending.append({"op": "put", "memory": record})
+
+    def _migrate_to_split(self):
+        """Build memories_meta.json + bodies from an inline memories.json (left untouched)"""
+        legacy = load_snapshot(self.data_dir / "memories.json")
+        if not legacy:
+            return
+        with self.file_lock.exclusive():
+            if self.memories_file.exists():
+                return  # another process migrated first
+            records = {memory_id: self._detach_body(memory) for memory_id, memory in legacy.items()}
+            self.bodies.sync()
+            if not save_json(self.memories_file, records):
+                raise RuntimeError(f"Failed to write {self.memories_file}")
+            self.file_lock.bump()
+
+    @property
+    def _compacted_meta_file(self) -> Path:
+        return self.memories_file.with_name(self.memories_file.name + ".compact")
+
+    def _finish_body_compaction(self):
+        """
+        Complete a body compaction interrupted by a crash, or discard one
+        that never reached its commit point (see _write_compacted_snapshots)
+        """
+        if not (self._compacted_meta_file.exists() or self.bodies.compact_path.exists()):
+            return
+        with self.file_lock.exclusive():
+            if self._compacted_meta_file.exists():
+                if self.bodies.compact_path.exists():
+                    self.bodies.install_compacted()
+                self.journal.reset()
+                os.replace(self._compacted_meta_file, self.memories_file)
+                self.file_lock.bump()
+            elif self.bodies.compact_path.exists():
+                os.remove(self.bodies.compact_path)
+
+    def _detach_body(self, memory: Dict) -> Dict:
+        """Move "content" into the body store, leaving a reference in its place"""
+        if self.bodies is None or "content" not in memory:
+            return memory
+        record = {}
+        for key, value in memory.items():
+            if key == "content":
+                offset, length = self.bodies.append(value)
+                record["body"] = {"offset": offset, "length": length}
+            else:
+                record[key] = value
+        return record
+
+    def _attach_body(self, record: Dict, cached: bool = True) -> Dict:
+        """Inverse of _detach_body: read the referenced content back in"""
+        if "body" not in record:
+            return record
+        memory = {}
+        for key, value in record.items():
+            if key == "body":
+                memory["content"] = self.bodies.read(value["offset"], value["length"], cached)
+            else:
+                memory[key] = value
+        return memory
+
+    def _replay_journal(self) -> List[str]:
+        """Apply journal records past the current offset; returns the IDs put"""
+        records, self._journal_offset = self.journal.replay(self._journal_offset)
+        return self._apply_records(records)
+
+    def _apply_records(self, records: List[Dict]) -> List[str]:
+        """Apply journal-shaped mutation records; returns the IDs put"""
+        seen = {}
+        put_ids = []
+        for record in records:
+            op = record.get("op")
+            if op == "put":
+                memory = self._detach_body(record["memory"])
+                self.memories[memory["id"]] = memory
+                put_ids.append(memory["id"])
+            elif op == "meta":
+                memory = self.memories.get(record["id"])
+                if memory is not None:
+                    memory.setdefault("metadata", {}).update(record["fields"])
+                    if "access_count" in record["fields"]:
+                        self.columns.set_access_count(record["id"], record["fields"]["access_count"])
+            elif op in ("index_add", "index_remove"):
+                # Replay must be idempotent: a crash between writing the
+                # snapshots and resetting the journal replays it twice.
+                ids = self.index.setdefault(record["section"], {}).setdefault(record["key"], [])
+                members = seen.setdefault((record["section"], record["key"]), set(ids))
+                if op == "index_add" and record["id"] not in members:
+                    ids.append(record["id"])
+                    members.add(record["id"])
+                elif op == "index_remove" and record["id"] in members:
+                    ids.remove(record["id"])
+                    members.discard(record["id"])
+                if not ids:
+                    del self.index[record["section"]][record["key"]]
+                    seen.pop((record["section"], record["key"]))
+            elif op == "index_set":
+                self.index.setdefault(record["section"], {})[record["key"]] = record["value"]
+        return put_ids
+
+    def _replay_access_log(self):
+        records, self._access_offset = self.access_log.replay(self._access_offset)
+        for record in records:
+            memory = self.memories.get(record["id"])
+            if memory is not None:
+                memory.setdefault("metadata", {})["access_count"] = record["access_count"]
+                self.columns.set_access_count(record["id"], record["access_count"])
+                self._access_ids.add(record["id"])
+
+    def _remember_signatures(self):
+        for path in (self.memories_file, self.index_file, self.journal.path, self.access_log.path):
+            self._signatures[path] = file_signature(path)
+
+    def is_stale(self) -> bool:
+        """True if another process committed or a file changed since our last load or write"""
+        return self.file_lock.version() != self._version or any(
+            file_signature(path) != signature
+            for path, signature in self._signatures.items()
+        )
+
+    def refresh(self) -> bool:
+        """Reload from disk if another process modified the files"""
+        if not self.is_stale():
+            return False
+        with self._lock:
+            if self._dirty or self._pending or self._pending_access:
+                # Mutations still waiting for their commit group are
+                # re-applied on top of the reload, not flushed early
+                self._rebase()
+                return True
+            # Decided under the file lock: a snapshot rewritten between the
+            # check and the replay would otherwise be skipped
+            with self.file_lock.shared():
+                snapshots_changed = any(
+                    file_signature(path) != self._signatures.get(path)
+                    for path in (self.memories_file, self.index_file)
+                )
+                reload = (snapshots_changed or self.journal.size < self._journal_offset
+                          or self.access_log.size < self._access_offset)
+                if not reload:
+                    # Another writer only appended to the logs: replay the tails
+                    put_ids = self._replay_journal()
+                    self._replay_access_log()
+                    self._version = self.file_lock.version()
+                    self._remember_signatures()
+            if reload:
+                self.load()
+            else:
+                for memory_id in put_ids:
+                    self._notify_add(memory_id, self.get(memory_id))
+        return True
+
+    def try_refresh(self) -> bool:
+        """
+        refresh() unless a commit is under way or waiting, in this or
+        another process (then False)
+        """
+        if self.committer.pending or not self._lock.acquire(blocking=False):
+            return False
+        try:
+            # Probe only: refresh() takes the file lock itself
+            if not self.file_lock.acquire(blocking=False):
+                return False
+            self.file_lock.release()
+            return self.refresh()
+        finally:
+            self._lock.release()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.memories)
+
+    def __contains__(self, memory_id):
+        return memory_id in self.memories
+
+    def get(self, memory_id: str) -> Optional[Dict]:
+        """Full memory, content included"""
+        record = self.memories.get(memory_id)
+        return self._attach_body(record) if record is not None else None
+
+    def metadata_items(self, memory_type: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        Iterate (id, record) pairs without loading content
+
+        In split layout records carry a "body" reference instead of
+        "content"; only id, type and metadata should be relied upon.
+        """
+        if memory_type is None:
+            return iter(self.memories.items())
+        return (
+            (memory_id, record) for memory_id, record in self.memories.items()
+            if record.get("type") == memory_type
+        )
+
+    def items(self, memory_type: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """Iterate (id, memory) pairs with content, optionally only of one type"""
+        return (
+            (memory_id, self._attach_body(record, cached=False))
+            for memory_id, record in self.metadata_items(memory_type)
+        )
+
+    def index_section(self, section: str) -> Dict[str, List[str]]:
+        return self.index.get(section, {})
+
+    def index_key_count(self, section: str) -> int:
+        """Number of distinct keys (tags, topics, sources) in a section"""
+        return len(self.index.get(section, {}))
+
+    def index_lookup(self, section: str, key: str) -> List[str]:
+        """Memory IDs listed under one key"""
+        return self.index.get(section, {}).get(key, [])
+
+    def index_get(self, section: str, key: str):
+        """Value stored by index_set(), or None"""
+        return self.index.get(section, {}).get(key)
+
+    # ------------------------------------------------------------------
+    # Mutations (RAM only until commit)
+    # ------------------------------------------------------------------
+
+    def put(self, memory: Dict):
+        """Insert or replace a memory"""
+        with self._lock:
+            record = self._detach_body(memory)
+            self.memories[record["id"]] = record
+            self._dirty.add(self.memories_file)
+            self._pending.append({"op": "put", "memory": record})
+            self._notify_add(record["id"], memory)
+
+    def index_add(self, section: str, key: str, memory_id: str):
+        """Append a memory ID to index[section][key]"""
+        with self._lock:
+            self.index.setdefault(section, {}).setdefault(key, []).append(memory_id)
+            self._dirty.add(self.index_file)
+            self._pending.append({"op": "index_add", "section": section, "key": key, "id": memory_id})
+
+    def index_remove(self, section: str, key: str, memory_id: str):
+        """Remove a memory ID from index[section][key]"""
+        with self._lock:
+            ids = self.index.get(section, {}).get(key)
+            if ids is None or memory_id not in ids:
+                return
+            ids.remove(memory_id)
+            if not ids:
+                del self.index[section][key]
+            self._dirty.add(self.index_file)
+            self._pending.append({"op": "index_remove", "section": section, "key": key, "id": memory_id})
+
+    def index_set(self, section: str, key: str, value):
+        """Store a JSON value as index[section][key] (e.g. sync checkpoints)"""
+        with self._lock:
+            self.index.setdefault(section, {})[key] = value
+            self._dirty.add(self.index_file)
+            self._pending.append({"op": "index_set", "section": section, "key": key, "value": value})
+
+    def bump_access(self, memory_id: str):
+        """Increment metadata.access_count of a memory (sidecar only, see class doc)"""
+        with self._lock:
+            metadata = self.memories[memory_id]["metadata"]
+            metadata["access_count"] = metadata.get("access_count", 0) + 1
+            # Increments, not counts, so they can be re-applied after a reload
+            self._pending_access[memory_id] = self._pending_access.get(memory_id, 0) + 1
+            self.columns.set_access_count(memory_id, metadata["access_count"])
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def commit(self) -> bool:
+        """Persist pending mutations (as part of the current commit group)"""
+        return self.committer.request()
+
+    def flush(self) -> bool:
+        """Write out any commit group still waiting (e.g. at shutdown)"""
+        return self.committer.flush()
+
+    def _flush(self) -> bool:
+        with self._lock:
+            if not (self._dirty or self._pending or self._pending_access):
+                return True
+        ok = self._write_locked(self._write_pending)
+        if ok and self._needs_compaction():
+            ok = self.compact()
+        return ok
+
+    def _needs_compaction(self) -> bool:
+        """The journal outgrew the snapshots, or replaced bodies outweigh live ones"""
+        with self._lock:
+            if self.journal_mode == JOURNAL_WAL:
+                snapshot_bytes = sum(
+                    (file_signature(path) or (0, 0))[1]
+                    for path in (self.memories_file, self.index_file)
+                )
+                if self._journal_offset > max(MIN_COMPACT_BYTES, snapshot_bytes):
+                    return True
+            if self.bodies is None or self.bodies.size <= self._body_compact_at:
+                return False
+            # Live bytes only grow along with the file, so they are summed
+            # again only once the file passes the last threshold
+            live_bytes = sum(
+                record["body"]["length"] for record in self.memories.values() if "body" in record
+            )
+            self._body_compact_at = max(MIN_COMPACT_BYTES, 2 * live_bytes)
+            return self.bodies.size > self._body_compact_at
+
+    def _write_pending(self) -> bool:
+        if self.bodies is not None:
+            self.bodies.sync()
+        if self.journal_mode == JOURNAL_WAL:
+            ok = self._commit_journal()
+        else:
+            ok = self._write_snapshots()
+        return self._commit_access() and ok
+
+    def _write_locked(self, write: Callable[[], bool]) -> bool:
+        """
+        Run `write` holding the file lock exclusively, after catching up
+        with whatever other processes committed since our last load
+        """
+        with self._lock, self.file_lock.exclusive():
+            if not self.is_stale():
+                return self._write_and_bump(write)
+        # Rebasing rebuilds the listeners, so readers must be kept out;
+        # state_lock is taken first to keep the lock order of callers
+        with self.state_lock, self._lock, self.file_lock.exclusive():
+            if self.is_stale():
+                self._rebase()
+            return self._write_and_bump(write)
+
+    def _write_and_bump(self, write: Callable[[], bool]) -> bool:
+        ok = write()
+        self._version = self.file_lock.bump()
+        return ok
+
+    def _rebase(self):
+        """Reload from disk and re-apply our uncommitted mutations on top"""
+        pending, dirty, access = list(self._pending), set(self._dirty), dict(self._pending_access)
+        if self.bodies is not None and self.bodies.replaced():
+            # Another process compacted the body file: our uncommitted
+            # bodies are only in the old one, so carry them over by value
+            pending = [
+                {"op": "put", "memory": self._attach_body(record["memory"], cached=False)}
+                if record.get("op") == "put" else record
+                for record in pending
+            ]
+        self.load()
+        put_ids = self._apply_records(pending)
+        self._pending.extend(pending)
+        self._dirty |= dirty
+        for memory_id, increment in access.items():
+            memory = self.memories.get(memory_id)
+            if memory is None:
+                continue
+            metadata = memory.setdefault("metadata", {})
+            metadata["access_count"] = metadata.get("access_count", 0) + increment
+            self.columns.set_access_count(memory_id, metadata["access_count"])
+            self._pending_access[memory_id] = increment
+        for memory_id in put_ids:
+            self._notify_add(memory_id, self.get(memory_id))
+
+    def _commit_access(self) -> bool:
+        """Append coalesced access counts (no fsync: they are statistics)"""
+        if not self._pending_access:
+            return True
+        records = [
+            {"id": memory_id, "access_count": self.memories[memory_id]["metadata"]["access_count"]}
+            for memory_id in self._pending_access
+            if memory_id in self.memories
+        ]
+        if not self.access_log.append(records, fsync=False):
+            return False
+        self._access_ids.update(self._pending_access)
+        self._pending_access.clear()
+        self._access_offset = self.access_log.size
+        self._remember_signatures()
+        if self._access_offset > ACCESS_FOLD_BYTES:
+            return self.fold_access_counts()
+        return True
+
+    def fold_access_counts(self) -> bool:
+        """Move sidecar access counts into the main records and reset the sidecar"""
+        return self._write_locked(self._fold_access_counts)
+
+    def _fold_access_counts(self) -> bool:
+        with self._lock:
+            if self.journal_mode == JOURNAL_OFF:
+                self._dirty.add(self.memories_file)
+                return self._write_snapshots()
+            records = [
+                {"op": "meta", "id": memory_id,
+                 "fields": {"access_count": self.memories[memory_id]["metadata"]["access_count"]}}
+                for memory_id in self._access_ids | set(self._pending_access)
+                if memory_id in self.memories
+            ]
+            if not self.journal.append(records):
+                return False
+            self._journal_offset = self.journal.size
+            self._reset_access_log()
+            self._remember_signatures()
+            return True
+
+    def _reset_access_log(self):
+        self._pending_access.clear()
+        self._access_ids.clear()
+        if self._access_offset or self.access_log.size:
+            self.access_log.reset()
+            self._access_offset = 0
+
+    def _commit_journal(self) -> bool:
+        if not self.journal.append(self._pending):
+            return False
+        self._pending.clear()
+        self._journal_offset = self.journal.size
+        self._remember_signatures()
+        return True
+
+    def compact(self) -> bool:
+        """
+        Fold the journal into memories.json/index.json and reset it; in
+        split layout also rewrite the body file with only the live bodies
+        """
+        def fold() -> bool:
+            self._dirty.update((self.memories_file, self.index_file))
+            return self._write_snapshots(compact_bodies=True)
+        if self.bodies is None:
+            return self._write_locked(fold)
+        # Body offsets change: readers (holding state_lock) must never pair
+        # a record from one side of the switch with the file of the other
+        with self.state_lock:
+            return self._write_locked(fold)
+
+    def _write_snapshots(self, compact_bodies: bool = False) -> bool:
+        if compact_bodies and self.bodies is not None:
+            return self._write_compacted_snapshots()
+        ok = True
+        if self.memories_file in self._dirty:
+            ok = save_json(self.memories_file, self.memories) and ok
+            if ok:
+                # The snapshot now carries every access count
+                self._reset_access_log()
+        if self.index_file in self._dirty:
+            ok = save_json(self.index_file, self.index) and ok
+        if ok:
+            self._dirty.clear()
+            self._pending.clear()
+            if self._journal_offset or self.journal.size:
+                self.journal.reset()
+                self._journal_offset = 0
+        self._remember_signatures()
+        return ok
+
+    def _write_compacted_snapshots(self) -> bool:
+        """
+        Write the snapshots against a new body file holding only live bodies
+
+        The live bodies are copied to the body store's compact_path and
+        the index is saved first; memories_meta.json.compact, the remapped
+        metadata, is the commit point. Then the body file is swapped, the
+        journal reset and the metadata renamed into place. load() rolls an
+        interrupted switch forward from the commit point, so no crash
+        pairs metadata with the wrong body file.
+        """
+        bodies = self.bodies
+        try:
+            offsets = bodies.write_compacted(
+                (record["body"]["offset"], record["body"]["length"])
+                for record in self.memories.values() if "body" in record
+            )
+            if not save_json(self.index_file, self.index):
+                raise OSError(f"Failed to write {self.index_file}")
+            records = {
+                memory_id: dict(record, body={
+                    "offset": offsets[record["body"]["offset"]], "length": record["body"]["length"]
+                }) if "body" in record else record
+                for memory_id, record in self.memories.items()
+            }
+            if not save_json(self._compacted_meta_file, records):
+                raise OSError(f"Failed to write {self._compacted_meta_file}")
+        except OSError as e:
+            print(f"Error compacting {bodies.path}: {e}")
+            if bodies.compact_path.exists():
+                os.remove(bodies.compact_path)
+            return False
+        try:
+            bodies.install_compacted()
+        except OSError as e:
+            # e.g. Windows refuses while another process has the file open:
+            # keep the old body file and write the snapshots as usual
+            print(f"Error replacing {bodies.path}: {e}")
+            os.remove(self._compacted_meta_file)
+            os.remove(bodies.compact_path)
+            return self._write_snapshots()
+        self.memories = records
+        self._reset_access_log()
+        self._dirty.clear()
+        self._pending.clear()
+        self.journal.reset()
+        self._journal_offset = 0
+        os.replace(self._compacted_meta_file, self.memories_file)
+        self._remember_signatures()
+        return True
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Timestamps for the Mneme memory store
+ISO strings are parsed once per memory into integer epoch milliseconds
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+MS_PER_DAY = 86_400_000
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """
+    Aware datetime for an ISO timestamp, None if missing or invalid
+
+    Naive timestamps were written by the original hybrid_memory_mcp.py
+    with datetime.now(), i.e. in local time, and are read as such.
+    """
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone()
+    return parsed
+
+
+def timestamp_ms(memory: Dict) -> Optional[int]:
+    """Creation time of a memory in Unix milliseconds"""
+    parsed = parse_timestamp(memory.get("metadata", {}).get("timestamp"))
+    return int(parsed.timestamp() * 1000) if parsed else None
+
+
+def normalize_timestamp(memory: Dict) -> bool:
+    """Rewrite a naive metadata timestamp as UTC with offset; True if changed"""
+    metadata = memory.get("metadata", {})
+    value = metadata.get("timestamp")
+    if not isinstance(value, str):
+        return False
+    try:
+        if datetime.fromisoformat(value).tzinfo is not None:
+            return False
+    except ValueError:
+        return False
+    metadata["timestamp"] = parse_timestamp(value).astimezone(timezone.utc).isoformat()
+    return True
+
+
+def ms_isoformat(epoch_ms: Optional[int]) -> Optional[str]:
+    """UTC ISO string for epoch milliseconds"""
+    if epoch_ms is None:
+        return None
+    return datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc).isoformat()
+
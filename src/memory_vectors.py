@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Vector index for the Mneme memory store
+Hashed TF-IDF vectors in one NumPy matrix, ranked by cosine similarity
+"""
+
+import hashlib
+import heapq
+import math
+import os
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from memory_persistence import load_derived, save_derived
+from memory_search import InvertedIndex, content_text
+
+# NumPy is required for the vector index; without it semantic search is
+# unavailable and keyword search works as before
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Vector width: 256 float32 values, 1 KiB per memory
+DEFAULT_DIM = 256
+
+# Each feature is hashed to this many signed coordinates (a sparse random
+# projection), which spreads collisions between features
+HASHES_PER_FEATURE = 2
+
+# Words of at least this many characters also contribute their trigrams, so
+# inflections and typos ("heron"/"herons") land near each other
+SUBWORD_MIN_LENGTH = 4
+
+# Share of a word's weight carried by its trigrams
+SUBWORD_WEIGHT = 0.5
+
+# Candidates taken from each ranking when blending: this many per result
+# asked for, and at least BLEND_MIN_POOL
+BLEND_POOL_FACTOR = 4
+BLEND_MIN_POOL = 50
+
+# Bump when features or weighting change so persisted vectors get rebuilt
+INDEX_FORMAT_VERSION = 1
+
+
+def vector_search_available() -> bool:
+    return np is not None
+
+
+@lru_cache(maxsize=1 << 16)
+def _hashed(feature: str, dim: int) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=4 * HASHES_PER_FEATURE).digest()
+    coordinates, signs = [], []
+    for i in range(HASHES_PER_FEATURE):
+        value = int.from_bytes(digest[4 * i:4 * i + 4], "little")
+        coordinates.append((value >> 1) % dim)
+        signs.append(1.0 if value & 1 else -1.0)
+    return tuple(coordinates), tuple(signs)
+
+
+@lru_cache(maxsize=1 << 16)
+def term_features(term: str, dim: int) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+    """Coordinates and unit-weight values a term projects to (word plus trigrams)"""
+    coordinates, values = [], []
+    scale = 1 / math.sqrt(HASHES_PER_FEATURE)
+    trigrams = []
+    if len(term) >= SUBWORD_MIN_LENGTH and term.isalnum():
+        padded = f"<{term}>"
+        trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+    word_weight = 1.0 - SUBWORD_WEIGHT if trigrams else 1.0
+    for feature, weight in [(term, word_weight)] + [
+        ("#" + trigram, SUBWORD_WEIGHT / math.sqrt(len(trigrams))) for trigram in trigrams
+    ]:
+        feature_coordinates, signs = _hashed(feature, dim)
+        coordinates.extend(feature_coordinates)
+        values.extend(sign * weight * scale for sign in signs)
+    return tuple(coordinates), tuple(values)
+
+
+class VectorIndex:
+    """
+    One L2-normalized hashed TF-IDF vector per memory (store listener)
+
+    Vectors are rows of a contiguous float32 matrix that share their
+    slots with the store's MetadataColumns, so the type/date masks of
+    the columns filter vector results directly. Capacity doubles like
+    the columns, so a save appends one row in amortized O(1); a query is
+    a single matrix-vector product plus a partial sort.
+
+    Terms come from the search index's tokenizer and are weighted by its
+    BM25 IDF (1 + log tf for documents) as of the time a memory is saved;
+    a rebuild refreshes the weights. The search index must be registered
+    before this one. With a persist path the matrix is saved as .npy
+    next to a header like the other derived indexes and restored at
+    startup while the store signature matches.
+    """
+
+    def __init__(self, columns, vocabulary: InvertedIndex, dim: int = DEFAULT_DIM,
+                 persist_path: Optional[Path] = None):
+        if np is None:
+            raise RuntimeError("The vector index needs NumPy (pip install numpy)")
+        if dim < 16:
+            raise ValueError("Vector dimension must be at least 16")
+        self.columns = columns
+        self.vocabulary = vocabulary
+        self.dim = dim
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.clear()
+
+    def clear(self):
+        self.positions: Dict[str, int] = {}
+        self.matrix = np.zeros((max(self.columns.capacity, 1), self.dim), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _reserve(self, position: int):
+        if position < len(self.matrix):
+            return
+        grown = np.zeros((max(2 * len(self.matrix), position + 1), self.dim), dtype=np.float32)
+        grown[:len(self.matrix)] = self.matrix
+        self.matrix = grown
+
+    def _embed(self, weights: Dict[str, float]):
+        """Normalized projection of term weights (None if there are none)"""
+        coordinates, values, counts = [], [], []
+        for term in weights:
+            term_coordinates, term_values = term_features(term, self.dim)
+            coordinates.extend(term_coordinates)
+            values.extend(term_values)
+            counts.append(len(term_values))
+        if not coordinates:
+            return None
+        scaled = np.array(values) * np.repeat(np.fromiter(weights.values(), float, len(weights)), counts)
+        vector = np.bincount(coordinates, weights=scaled, minlength=self.dim).astype(np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else None
+
+    def _document_vector(self, memory: Dict):
+        frequencies: Dict[str, int] = {}
+        for token in self.vocabulary.tokenizer(content_text(memory.get("content", {}))):
+            frequencies[token] = frequencies.get(token, 0) + 1
+        return self._embed({
+            term: (1 + math.log(tf)) * self.vocabulary.idf(term) for term, tf in frequencies.items()
+        })
+
+    def query_vector(self, query: str):
+        terms = set(self.vocabulary.tokenizer(query, query=True))
+        return self._embed({term: self.vocabulary.idf(term) for term in terms})
+
+    # ------------------------------------------------------------------
+    # Listener protocol
+    # ------------------------------------------------------------------
+
+    def rebuild(self, items: Iterable[Tuple[str, Dict]]):
+        self.clear()
+        for memory_id, memory in items:
+            self.add(memory_id, memory)
+
+    def add(self, memory_id: str, memory: Dict):
+        self.remove(memory_id)
+        position = self.columns.positions.get(memory_id)
+        vector = self._document_vector(memory)
+        if position is None or vector is None:
+            return
+        self._reserve(position)
+        self.matrix[position] = vector
+        self.positions[memory_id] = position
+
+    def remove(self, memory_id: str):
+        # The columns may already have released the slot, so we keep our own map
+        position = self.positions.pop(memory_id, None)
+        if position is not None:
+            self.matrix[position] = 0.0
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _header(self, signature) -> Dict:
+        return {
+            "version": INDEX_FORMAT_VERSION,
+            "tokenizer": getattr(self.vocabulary.tokenizer, "name", repr(self.vocabulary.tokenizer)),
+            "dim": self.dim,
+            "signature": signature,
+        }
+
+    def persist(self, signature) -> bool:
+        """Save the vectors as reflecting the store state `signature`"""
+        if self.persist_path is None:
+            return False
+        ids = list(self.positions)
+        # A fresh file name per save: the header only points at it once it
+        # is complete, so a crash never pairs a header with other vectors
+        matrix_path = self.persist_path.with_name(
+            f"{self.persist_path.stem}.{uuid.uuid4().hex[:12]}.npy"
+        )
+        try:
+            with open(matrix_path, "wb") as f:
+                np.save(f, self.matrix[[self.positions[memory_id] for memory_id in ids]])
+            save_derived(self.persist_path, self._header(signature),
+                         {"ids": ids, "matrix": matrix_path.name})
+        except Exception as e:
+            print(f"Error saving vector index to {self.persist_path}: {e}")
+            return False
+        for old in self.persist_path.parent.glob(f"{self.persist_path.stem}.*.npy"):
+            if old != matrix_path:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+        return True
+
+    def restore(self, signature) -> bool:
+        """Load persisted vectors if they match `signature`; False means rebuild"""
+        if self.persist_path is None:
+            return False
+        data = load_derived(self.persist_path, self._header(signature))
+        if data is None:
+            return False
+        try:
+            vectors = np.load(self.persist_path.with_name(data["matrix"]))
+        except (OSError, ValueError):
+            return False
+        if vectors.shape != (len(data["ids"]), self.dim):
+            return False
+        positions = [self.columns.positions.get(memory_id) for memory_id in data["ids"]]
+        if any(position is None for position in positions):
+            return False
+        self.clear()
+        if positions:
+            self._reserve(max(positions))
+            self.matrix[positions] = vectors
+        self.positions = dict(zip(data["ids"], positions))
+        return True
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def similarities(self, query: str):
+        """Cosine similarity of the query with every slot (0 for empty slots), or None"""
+        vector = self.query_vector(query)
+        if vector is None:
+            return None
+        return self.matrix[:len(self.columns.ids)] @ vector
+
+    def search(self, query: str, limit: int = 5, mask=None,
+               keyword: Optional[Dict[str, float]] = None,
+               weight: float = 1.0) -> List[Tuple[str, float, float, float]]:
+        """
+        Top `limit` (memory_id, score, keyword score, cosine), best first
+
+        score = (1 - weight) * keyword / max(keyword) + weight * cosine.
+        Candidates are the best keyword matches plus the nearest vectors
+        (a pool of several times `limit` from each); `mask` (from
+        MetadataColumns.mask) restricts the vectors, and `keyword` should
+        already be filtered the same way.
+        """
+        keyword = keyword or {}
+        pool = max(limit * BLEND_POOL_FACTOR, BLEND_MIN_POOL) if 0 < weight < 1 else limit
+        cosines = self.similarities(query)
+        if cosines is None:
+            cosines = np.zeros(len(self.columns.ids), dtype=np.float32)
+        elif mask is not None:
+            cosines = np.where(mask[:len(cosines)], cosines, 0.0)
+
+        candidates = set()
+        if weight > 0 and len(cosines):
+            nearest = np.argpartition(-cosines, min(pool, len(cosines) - 1))[:pool]
+            candidates.update(
+                self.columns.ids[position] for position in nearest.tolist() if cosines[position] > 0
+            )
+        if weight < 1:
+            candidates.update(
+                memory_id for memory_id, _ in heapq.nlargest(pool, keyword.items(), key=lambda item: item[1])
+            )
+
+        top_keyword = max(keyword.values(), default=0.0) or 1.0
+        ranked = []
+        for memory_id in candidates:
+            position = self.positions.get(memory_id)
+            cosine = float(cosines[position]) if position is not None and position < len(cosines) else 0.0
+            keyword_score = keyword.get(memory_id, 0.0)
+            score = (1 - weight) * keyword_score / top_keyword + weight * cosine
+            if score > 0:
+                ranked.append((memory_id, score, keyword_score, cosine))
+        ranked.sort(key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    def stats(self) -> Dict:
+        return {
+            "memories": len(self.positions),
+            "dim": self.dim,
+            "matrix_bytes": int(self.matrix.nbytes),
+        }
@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+Notion backfill and incremental sync for the Mneme MCP servers
+Pages through the configured Notion databases concurrently and saves them in batches
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from memory_columns import source_key
+
+try:
+    import httpx
+    from notion_client import AsyncClient
+    from notion_client.errors import HTTPResponseError, RequestTimeoutError
+except ImportError:
+    AsyncClient = None
+
+# The Notion databases of docs/ARCHITECTURE.md: source name (as the
+# prompts of get_daily_inspiration_prompt name it) -> environment
+# variable holding the database ID
+NOTION_DATABASES = {
+    "Diary": "DIARY_DB_ID",
+    "General Notes": "MEMO_DB_ID",
+    "Learning Log": "LEARNING_LOG_DB_ID",
+    "Idea Collection": "IDEAS_DB_ID",
+    "Synopsis Writing Practice": "SYNOPSIS_DB_ID",
+    "Phrases": "PHRASES_DB_ID",
+    "Quote Collection": "QUOTES_DB_ID",
+    "Work Log": "WORK_LOG_DB_ID",
+    "Communication Log": "COMMUNICATION_LOG_DB_ID",
+    "Projects": "PROJECTS_DB_ID",
+    "Tasks": "TASKS_DB_ID",
+}
+
+DEFAULT_BASE_URL = "https://api.notion.com"
+
+# API version the requests below are written against (databases/{id}/query)
+NOTION_VERSION = "2022-06-28"
+
+# Largest page size the Notion API accepts
+PAGE_SIZE = 100
+
+# Responses worth retrying: rate limited, conflicts and server-side failures
+RETRY_STATUSES = {409, 429, 500, 502, 503, 504}
+
+# Block types whose rich_text is page content
+TEXT_BLOCKS = {
+    "paragraph", "heading_1", "heading_2", "heading_3", "bulleted_list_item",
+    "numbered_list_item", "to_do", "toggle", "quote", "callout", "code",
+}
+
+
+def configured_databases(environ=None) -> Dict[str, str]:
+    """Source name -> database ID for every database with an ID configured"""
+    environ = os.environ if environ is None else environ
+    databases = {}
+    for name, variable in NOTION_DATABASES.items():
+        database_id = (environ.get(variable) or "").strip()
+        # .env.example placeholders look like YOUR_DIARY_DATABASE_ID
+        if database_id and not database_id.startswith("YOUR_"):
+            databases[name] = database_id
+    return databases
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket: `rate_per_minute` tokens a minute, at most
+    `capacity` banked (default: one second's worth, at least 1)
+
+    Waiters are served in arrival order, so one bucket shared by every
+    coroutine keeps the combined call rate under the limit.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if rate_per_minute <= 0:
+            raise ValueError("Rate limit must be positive")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                now = self._clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class NotionAPI:
+    """
+    The few Notion endpoints the backfill needs, rate limited and retried
+
+    Every attempt (retries included) takes a token from the shared
+    bucket. Rate limiting (429), conflicts, 5xx responses, timeouts and
+    connection errors are retried up to `retry_attempts` times with
+    exponential backoff and jitter, honouring Retry-After when the
+    server sends one; other errors are raised at once.
+    """
+
+    def __init__(self, token: str, base_url: str = DEFAULT_BASE_URL,
+                 calls_per_minute: float = 60, retry_attempts: int = 3,
+                 backoff: float = 1.0, max_backoff: float = 60.0):
+        if AsyncClient is None:
+            raise RuntimeError("notion-client package not found. Please install it with: pip install notion-client")
+        options = {
+            "auth": token, "base_url": base_url, "notion_version": NOTION_VERSION,
+            # Failed attempts are ours to report (see the backfill summary)
+            "log_level": logging.ERROR,
+        }
+        try:
+            # Retries are ours, so that each one goes through the bucket
+            self.client = AsyncClient(**options, retry=False)
+        except TypeError:
+            # notion-client 2.x has no built-in retries to turn off
+            self.client = AsyncClient(**options)
+        self.bucket = TokenBucket(calls_per_minute)
+        self.retry_attempts = max(0, retry_attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.calls = 0
+        self.retries = 0
+
+    async def request(self, path: str, method: str = "GET",
+                      query: Optional[Dict] = None, body: Optional[Dict] = None) -> Dict:
+        for attempt in range(self.retry_attempts + 1):
+            await self.bucket.acquire()
+            self.calls += 1
+            try:
+                return await self.client.request(path=path, method=method, query=query, body=body)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None or attempt == self.retry_attempts:
+                    raise
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying after `error`, None if it is final"""
+        if isinstance(error, HTTPResponseError):
+            if error.status not in RETRY_STATUSES:
+                return None
+            retry_after = (getattr(error, "headers", None) or {}).get("retry-after")
+            try:
+                if retry_after is not None:
+                    return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        elif not isinstance(error, (RequestTimeoutError, httpx.TransportError)):
+            return None
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def query_database(self, database_id: str, cursor: Optional[str] = None,
+                             edited_since: Optional[str] = None) -> Dict:
+        """One page of results, least recently edited first"""
+        body = {
+            "page_size": PAGE_SIZE,
+            "sorts": [{"timestamp": "last_edited_time", "direction": "ascending"}],
+        }
+        if edited_since:
+            body["filter"] = {
+                "timestamp": "last_edited_time",
+                "last_edited_time": {"on_or_after": edited_since},
+            }
+        if cursor:
+            body["start_cursor"] = cursor
+        return await self.request(f"databases/{database_id}/query", "POST", body=body)
+
+    async def block_children(self, block_id: str, cursor: Optional[str] = None) -> Dict:
+        query = {"page_size": PAGE_SIZE}
+        if cursor:
+            query["start_cursor"] = cursor
+        return await self.request(f"blocks/{block_id}/children", "GET", query=query)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+# ----------------------------------------------------------------------
+# Pages to save_many_from_notion items
+# ----------------------------------------------------------------------
+
+def plain_text(rich_text) -> str:
+    return "".join(part.get("plain_text", "") for part in rich_text or [])
+
+
+def page_title(page: Dict) -> str:
+    for prop in page.get("properties", {}).values():
+        if prop.get("type") == "title":
+            return plain_text(prop.get("title")).strip()
+    return ""
+
+
+def page_tags(page: Dict) -> List[str]:
+    """Names of the page's select and multi-select options"""
+    tags = []
+    for prop in page.get("properties", {}).values():
+        if prop.get("type") == "multi_select":
+            tags.extend(option["name"] for option in prop.get("multi_select") or [])
+        elif prop.get("type") == "select" and prop.get("select"):
+            tags.append(prop["select"]["name"])
+    return list(dict.fromkeys(tags))
+
+
+def page_properties_text(page: Dict) -> List[str]:
+    """Text properties (e.g. a summary column), one line each"""
+    return [
+        text for text in (
+            plain_text(prop.get("rich_text")).strip()
+            for prop in page.get("properties", {}).values()
+            if prop.get("type") == "rich_text"
+        ) if text
+    ]
+
+
+def block_text(block: Dict) -> str:
+    block_type = block.get("type")
+    if block_type not in TEXT_BLOCKS:
+        return ""
+    return plain_text(block.get(block_type, {}).get("rich_text"))
+
+
+class NotionBackfill:
+    """
+    Streams every page of several Notion databases into batch saves
+
+    One producer per database pages through its query results and reads
+    the blocks of each page (at most `page_concurrency` pages at a time
+    per database; nested blocks included). All API calls share the
+    NotionAPI token bucket, so adding databases adds concurrency, not
+    load. A single consumer collects `batch_size` pages and hands each
+    batch to `save_batch(pages, checkpoints)`, a blocking function run on
+    a thread that returns a save_many_from_notion style result; the queue
+    between them is bounded, so memory use stays flat and progress is
+    committed as the import goes. A database that fails for good is
+    reported and the others carry on.
+
+    Pages are queried least recently edited first. After each page of
+    query results the producer queues a checkpoint for its database:
+
+        {"database_id": ..., "last_edited_time": <newest edit saved>,
+         "query_since": <filter of the running query>, "cursor": <next page>}
+
+    which reaches save_batch behind the pages it covers, so it is
+    committed with them. With `incremental` the query only asks for
+    pages edited on or after the checkpoint's last_edited_time. An
+    interrupted run left a cursor in its checkpoint; the next run resumes
+    that query where it stopped. Checkpoints stop advancing for a
+    database once one of its pages could not be read, so that page is
+    fetched again next time.
+    """
+
+    def __init__(self, api: NotionAPI, databases: Dict[str, str],
+                 save_batch: Callable[[List[Dict], Dict[str, Dict]], Dict], batch_size: int = 50,
+                 page_concurrency: int = 4, checkpoints: Optional[Dict[str, Dict]] = None,
+                 incremental: bool = False):
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+        self.api = api
+        self.databases = databases
+        self.save_batch = save_batch
+        self.batch_size = batch_size
+        self.page_concurrency = max(1, page_concurrency)
+        self.checkpoints = checkpoints or {}
+        self.incremental = incremental
+        self.report = {
+            name: {"pages": 0, "errors": []} for name in databases
+        }
+        self.saved = 0
+        self.updated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.batches = 0
+
+    async def run(self) -> Dict:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=2 * self.batch_size)
+        consumer = asyncio.create_task(self._consume(queue))
+        try:
+            await asyncio.gather(*(
+                self._produce(name, database_id, queue)
+                for name, database_id in self.databases.items()
+            ))
+        finally:
+            await queue.put(None)
+            await consumer
+        return {
+            "success": not any(entry["errors"] for entry in self.report.values()),
+            "databases": self.report,
+            "saved_count": self.saved,
+            "updated_count": self.updated,
+            "skipped_count": self.skipped,
+            "failed_count": self.failed,
+            "batches": self.batches,
+            "api_calls": self.api.calls,
+            "retries": self.api.retries,
+        }
+
+    def _start(self, name: str, database_id: str):
+        """(edited_since filter, cursor, last_edited_time) to start a database from"""
+        state = self.checkpoints.get(name)
+        if not state or state.get("database_id") != database_id:
+            return None, None, None
+        mark = state.get("last_edited_time")
+        if state.get("cursor"):
+            return state.get("query_since"), state["cursor"], mark
+        return (mark if self.incremental else None), None, mark
+
+    async def _produce(self, name: str, database_id: str, queue: asyncio.Queue):
+        entry = self.report[name]
+        limit = asyncio.Semaphore(self.page_concurrency)
+        since, cursor, mark = self._start(name, database_id)
+        advancing = True
+        while True:
+            try:
+                response = await self.api.query_database(database_id, cursor, since)
+            except HTTPResponseError as e:
+                if cursor and e.status == 400:
+                    # The saved cursor is no longer accepted: rerun the query
+                    since, cursor = (mark if self.incremental else None), None
+                    continue
+                entry["errors"].append(f"Query failed: {e}")
+                return
+            except Exception as e:
+                entry["errors"].append(f"Query failed: {e}")
+                return
+            pages = [
+                page for page in response.get("results", [])
+                if page.get("object") == "page"
+                and not (page.get("archived") or page.get("in_trash"))
+            ]
+            items = await asyncio.gather(*(self._read_page(name, page, limit) for page in pages))
+            for item in items:
+                if item is None:
+                    advancing = False
+                    continue
+                entry["pages"] += 1
+                await queue.put(item)
+                if advancing and item["last_edited_time"]:
+                    mark = max(mark or "", item["last_edited_time"])
+            cursor = response.get("next_cursor") if response.get("has_more") else None
+            if advancing:
+                await queue.put({"checkpoint": name, "state": {
+                    "database_id": database_id, "last_edited_time": mark,
+                    "query_since": since, "cursor": cursor,
+                }})
+            if not cursor:
+                return
+
+    async def _read_page(self, name: str, page: Dict, limit: asyncio.Semaphore) -> Optional[Dict]:
+        async with limit:
+            try:
+                lines = await self._block_lines(page["id"])
+            except Exception as e:
+                self.report[name]["errors"].append(f"Page {page.get('id')}: {e}")
+                return None
+        title = page_title(page) or "Untitled"
+        content = "\n".join(page_properties_text(page) + lines).strip() or title
+        return {
+            "content": content,
+            "title": title,
+            "source_db": name,
+            "notion_url": page.get("url"),
+            "tags": page_tags(page),
+            "created_time": page.get("created_time"),
+            "notion_page_id": page["id"],
+            "last_edited_time": page.get("last_edited_time"),
+        }
+
+    async def _block_lines(self, block_id: str) -> List[str]:
+        """Text of a block's children, depth first"""
+        lines = []
+        cursor = None
+        while True:
+            response = await self.api.block_children(block_id, cursor)
+            for block in response.get("results", []):
+                text = block_text(block)
+                if text:
+                    lines.append(text)
+                if block.get("has_children") and block.get("type") != "child_page":
+                    lines.extend(await self._block_lines(block["id"]))
+            cursor = response.get("next_cursor")
+            if not (response.get("has_more") and cursor):
+                return lines
+
+    async def _consume(self, queue: asyncio.Queue):
+        batch = []
+        checkpoints = {}
+        saving = True
+        while True:
+            item = await queue.get()
+            if item is not None and "checkpoint" in item:
+                checkpoints[item["checkpoint"]] = item["state"]
+            elif item is not None:
+                batch.append(item)
+            if (batch or checkpoints) and (item is None or len(batch) >= self.batch_size):
+                # After a failed batch no later checkpoint may be stored
+                saving = await self._save(batch, checkpoints if saving else {}) and saving
+                batch = []
+                checkpoints = {}
+            if item is None:
+                return
+
+    async def _save(self, batch: List[Dict], checkpoints: Dict[str, Dict]) -> bool:
+        if not batch and not checkpoints:
+            return True
+        self.batches += 1
+        try:
+            result = await asyncio.to_thread(self.save_batch, batch, checkpoints)
+        except Exception as e:
+            result = {"success": False, "message": str(e)}
+        if not result.get("success"):
+            self.failed += len(batch)
+            print(f"Error saving Notion batch: {result.get('message')}")
+            return False
+        self.saved += result.get("saved_count", 0)
+        self.updated += result.get("updated_count", 0)
+        self.skipped += result.get("skipped_count", 0)
+        self.failed += result.get("failed_count", 0)
+        return True
+
+
+async def backfill(save_batch: Callable[[List[Dict], Dict[str, Dict]], Dict],
+                   names: Optional[List[str]] = None, batch_size: int = 50,
+                   page_concurrency: int = 4, checkpoints: Optional[Dict[str, Dict]] = None,
+                   incremental: bool = False) -> Dict:
+    """
+    Backfill (or with `incremental`, sync) the configured databases, or
+    only `names`, through `save_batch`
+
+    Reads NOTION_API_KEY, NOTION_BASE_URL (e.g. a local fake server),
+    MAX_API_CALLS_PER_MINUTE and RETRY_ATTEMPTS from the environment.
+    """
+    token = os.environ.get("NOTION_API_KEY")
+    if not token:
+        raise ValueError("NOTION_API_KEY is not set")
+    databases = configured_databases()
+    if names:
+        # Names match like source names elsewhere ("learning_log" selects "Learning Log")
+        by_key = {source_key(name): name for name in databases}
+        unknown = [name for name in names if source_key(name) not in by_key]
+        if unknown:
+            raise ValueError(f"No database ID configured for: {', '.join(unknown)}")
+        selected = [by_key[source_key(name)] for name in names]
+        databases = {name: databases[name] for name in selected}
+    if not databases:
+        raise ValueError("No Notion database IDs configured (DIARY_DB_ID, MEMO_DB_ID, ...)")
+    api = NotionAPI(
+        token,
+        base_url=os.environ.get("NOTION_BASE_URL", DEFAULT_BASE_URL),
+        calls_per_minute=float(os.environ.get("MAX_API_CALLS_PER_MINUTE", "60")),
+        retry_attempts=int(os.environ.get("RETRY_ATTEMPTS", "3")),
+    )
+    try:
+        return await NotionBackfill(
+            api, databases, save_batch, batch_size, page_concurrency, checkpoints, incremental
+        ).run()
+    finally:
+        await api.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import every page of the configured Notion databases")
+    parser.add_argument("databases", nargs="*", help="source names to import (default: all configured)")
+    parser.add_argument("--sync", action="store_true",
+                        help="only pages edited since the last run (databases never imported are read in full)")
+    parser.add_argument("--batch-size", type=int, default=50, help="pages saved per commit")
+    parser.add_argument("--page-concurrency", type=int, default=4, help="pages read at once per database")
+    args = parser.parse_args()
+
+    # Optional: read NOTION_API_KEY and the database IDs from .env
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    # Saving goes through the server module, so the configured storage
+    # backend, indexes and cross-process locking all apply
+    from hybrid_memory_mcp_fixed import DATA_DIR, NOTION_SYNC_SECTION, io, save_notion_pages, store
+
+    def save_batch(pages: List[Dict], checkpoints: Dict[str, Dict]) -> Dict:
+        # On the server's writer, which first reloads what a running
+        # server saved meanwhile, so a page it saved is updated, not copied
+        return io.submit_write(save_notion_pages, pages, checkpoints).result()
+
+    checkpoints = {
+        name: store.index_get(NOTION_SYNC_SECTION, name) for name in NOTION_DATABASES
+    }
+    print(f"{'Syncing' if args.sync else 'Backfilling'} Notion into {DATA_DIR}...")
+    try:
+        report = asyncio.run(backfill(save_batch, args.databases, args.batch_size,
+                                      args.page_concurrency, checkpoints, args.sync))
+    except Exception as e:
+        print(f"Error backfilling from Notion: {e}")
+        sys.exit(1)
+    for name, entry in report["databases"].items():
+        print(f"  {name}: {entry['pages']} pages")
+        for error in entry["errors"]:
+            print(f"    {error}")
+    print(f"Saved {report['saved_count']} pages ({report['updated_count']} updated, "
+          f"{report['skipped_count']} unchanged) "
+          f"in {report['batches']} batches "
+          f"({report['failed_count']} failed, {report['api_calls']} API calls, "
+          f"{report['retries']} retries)")
+    if not report["success"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
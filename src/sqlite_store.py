@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+SQLite storage backend for the Mneme MCP servers
+Same interface as MemoryStore, backed by an indexed database in WAL mode
+
+Run directly to migrate an existing memories.json/index.json:
+    python sqlite_store.py [DATA_DIR]
+"""
+
+import json
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from memory_store import LAYOUT_INLINE, LAYOUT_SPLIT, MemoryStore, file_signature
+from memory_columns import MetadataColumns, source_db
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    id TEXT PRIMARY KEY,
+    type TEXT,
+    timestamp TEXT,
+    source_db TEXT,
+    importance REAL,
+    access_count INTEGER NOT NULL DEFAULT 0,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_memories_type ON memories(type);
+CREATE INDEX IF NOT EXISTS idx_memories_timestamp ON memories(timestamp);
+CREATE INDEX IF NOT EXISTS idx_memories_source_db ON memories(source_db);
+
+CREATE TABLE IF NOT EXISTS memory_bodies (
+    id TEXT PRIMARY KEY,
+    content TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    memory_id TEXT NOT NULL,
+    PRIMARY KEY (tag, memory_id)
+);
+CREATE TABLE IF NOT EXISTS topics (
+    topic TEXT NOT NULL,
+    memory_id TEXT NOT NULL,
+    PRIMARY KEY (topic, memory_id)
+);
+CREATE TABLE IF NOT EXISTS notion_imports (
+    source_db TEXT NOT NULL,
+    memory_id TEXT NOT NULL,
+    PRIMARY KEY (source_db, memory_id)
+);
+CREATE TABLE IF NOT EXISTS notion_pages (
+    page_id TEXT NOT NULL,
+    memory_id TEXT NOT NULL,
+    PRIMARY KEY (page_id, memory_id)
+);
+CREATE TABLE IF NOT EXISTS index_values (
+    section TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (section, key)
+);
+"""
+
+# index.json section -> (table, key column)
+INDEX_TABLES = {
+    "tags": ("tags", "tag"),
+    "topics": ("topics", "topic"),
+    "notion_imports": ("notion_imports", "source_db"),
+    "notion_pages": ("notion_pages", "page_id"),
+}
+
+
+class SQLiteMemoryStore:
+    """
+    MemoryStore-compatible backend on top of SQLite
+
+    Every memory is one row: the record minus its content as JSON plus
+    the columns used for filtering (type, timestamp, source_db) and the
+    mutable access_count. Content lives in memory_bodies and is only
+    joined in by get()/items(). index.json sections of memory IDs map
+    to their own tables; sections of single values (index_set) share
+    index_values. Listeners work as with MemoryStore; refresh() rebuilds them
+    when another connection changed the database.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        # Shared by the server's reader and writer threads (SQLite itself
+        # serializes access to one connection)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        # Columnar metadata, kept current ahead of the other listeners
+        self.columns = MetadataColumns()
+        self.columns.rebuild(self.metadata_items())
+        self._listeners: List = [self.columns]
+        self._data_version = self._current_data_version()
+
+    def _current_data_version(self) -> int:
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def add_listener(self, listener):
+        """Register a derived structure (see MemoryStore.add_listener)"""
+        self._listeners.append(listener)
+        restore = getattr(listener, "restore", None)
+        if not (restore and restore(self.signature())):
+            listener.rebuild(self._listener_items(listener))
+
+    def _listener_items(self, listener):
+        """Listeners declaring needs_content = False are fed metadata only"""
+        if getattr(listener, "needs_content", True):
+            return self.items()
+        return self.metadata_items()
+
+    def signature(self) -> List:
+        """JSON-serializable fingerprint of the database files"""
+        return [
+            list(file_signature(path) or ())
+            for path in (self.db_path, Path(f"{self.db_path}-wal"))
+        ]
+
+    def refresh(self) -> bool:
+        """
+        Reads always see the latest committed rows; only derived listeners
+        need rebuilding when another connection committed in the meantime
+        """
+        version = self._current_data_version()
+        if version == self._data_version:
+            return False
+        self._data_version = version
+        for listener in self._listeners:
+            listener.rebuild(self._listener_items(listener))
+        return True
+
+    def try_refresh(self) -> bool:
+        """Same as refresh(): checking data_version never waits on a commit"""
+        return self.refresh()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _decode(row) -> Tuple[str, Dict]:
+        memory_id, record, access_count = row[:3]
+        memory = json.loads(record)
+        if len(row) > 3 and row[3] is not None:
+            # Restore "content" in its usual place, right after "type"
+            content = json.loads(row[3])
+            memory = {
+                "id": memory.pop("id", memory_id),
+                "type": memory.pop("type", None),
+                "content": content,
+                **memory
+            }
+        memory.setdefault("metadata", {})["access_count"] = access_count
+        return memory_id, memory
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+
+    def __contains__(self, memory_id):
+        return self.conn.execute(
+            "SELECT 1 FROM memories WHERE id = ?", (memory_id,)
+        ).fetchone() is not None
+
+    def get(self, memory_id: str) -> Optional[Dict]:
+        """Full memory, content included"""
+        row = self.conn.execute(
+            "SELECT m.id, m.record, m.access_count, b.content FROM memories m "
+            "LEFT JOIN memory_bodies b ON b.id = m.id WHERE m.id = ?", (memory_id,)
+        ).fetchone()
+        return self._decode(row)[1] if row else None
+
+    def _select(self, columns: str, join: str, memory_type: Optional[str]):
+        query = f"SELECT {columns} FROM memories m {join}"
+        if memory_type is None:
+            return self.conn.execute(query).fetchall()
+        return self.conn.execute(query + " WHERE m.type = ?", (memory_type,)).fetchall()
+
+    def metadata_items(self, memory_type: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """Iterate (id, record) pairs without reading memory_bodies"""
+        rows = self._select("m.id, m.record, m.access_count", "", memory_type)
+        return (self._decode(row) for row in rows)
+
+    def items(self, memory_type: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """Iterate (id, memory) pairs with content, optionally only of one type"""
+        rows = self._select(
+            "m.id, m.record, m.access_count, b.content",
+            "LEFT JOIN memory_bodies b ON b.id = m.id",
+            memory_type
+        )
+        return (self._decode(row) for row in rows)
+
+    def index_section(self, section: str) -> Dict[str, List[str]]:
+        table, column = INDEX_TABLES[section]
+        result: Dict[str, List[str]] = {}
+        for key, memory_id in self.conn.execute(
+            f"SELECT {column}, memory_id FROM {table} ORDER BY rowid"
+        ):
+            result.setdefault(key, []).append(memory_id)
+        return result
+
+    def index_key_count(self, section: str) -> int:
+        """Number of distinct keys (tags, topics, sources) in a section"""
+        table, column = INDEX_TABLES[section]
+        return self.conn.execute(
+            f"SELECT COUNT(DISTINCT {column}) FROM {table}"
+        ).fetchone()[0]
+
+    def index_lookup(self, section: str, key: str) -> List[str]:
+        """Memory IDs listed under one key (primary key lookup)"""
+        table, column = INDEX_TABLES[section]
+        return [
+            row[0] for row in self.conn.execute(
+                f"SELECT memory_id FROM {table} WHERE {column} = ? ORDER BY rowid", (key,)
+            )
+        ]
+
+    def index_get(self, section: str, key: str):
+        """Value stored by index_set(), or None"""
+        row = self.conn.execute(
+            "SELECT value FROM index_values WHERE section = ? AND key = ?", (section, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # ------------------------------------------------------------------
+    # Mutations (inside the open transaction until commit)
+    # ------------------------------------------------------------------
+
+    def put(self, memory: Dict):
+        """Insert or replace a memory"""
+        metadata = memory.get("metadata", {})
+        record = {key: value for key, value in memory.items() if key != "content"}
+        self.conn.execute(
+            "INSERT OR REPLACE INTO memories "
+            "(id, type, timestamp, source_db, importance, access_count, record) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                memory["id"],
+                memory.get("type"),
+                metadata.get("timestamp"),
+                source_db(memory),
+                metadata.get("importance"),
+                metadata.get("access_count", 0),
+                json.dumps(record, ensure_ascii=False),
+            ),
+        )
+        self.conn.execute(
+            "INSERT OR REPLACE INTO memory_bodies (id, content) VALUES (?, ?)",
+            (memory["id"], json.dumps(memory.get("content", {}), ensure_ascii=False)),
+        )
+        for listener in self._listeners:
+            listener.add(memory["id"], memory)
+
+    def index_add(self, section: str, key: str, memory_id: str):
+        """Add a memory ID to a tag/topic/notion_imports table"""
+        table, column = INDEX_TABLES[section]
+        self.conn.execute(
+            f"INSERT OR IGNORE INTO {table} ({column}, memory_id) VALUES (?, ?)",
+            (key, memory_id),
+        )
+
+    def index_remove(self, section: str, key: str, memory_id: str):
+        """Remove a memory ID from a tag/topic/notion_imports table"""
+        table, column = INDEX_TABLES[section]
+        self.conn.execute(
+            f"DELETE FROM {table} WHERE {column} = ? AND memory_id = ?", (key, memory_id)
+        )
+
+    def index_set(self, section: str, key: str, value):
+        """Store a JSON value under section/key (e.g. sync checkpoints)"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO index_values (section, key, value) VALUES (?, ?, ?)",
+            (section, key, json.dumps(value, ensure_ascii=False)),
+        )
+
+    def bump_access(self, memory_id: str):
+        """Increment the access_count column of a memory"""
+        self.conn.execute(
+            "UPDATE memories SET access_count = access_count + 1 WHERE id = ?",
+            (memory_id,),
+        )
+        self.columns.bump_access(memory_id)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def commit(self) -> bool:
+        try:
+            self.conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error committing to {self.db_path}: {e}")
+            self.conn.rollback()
+            for listener in self._listeners:
+                listener.rebuild(self._listener_items(listener))
+            return False
+
+    def compact(self) -> bool:
+        """Checkpoint the SQLite WAL into the main database file"""
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return True
+
+    def close(self):
+        self.conn.close()
+
+
+def migrate_json_to_sqlite(data_dir, db_path=None) -> int:
+    """
+    One-shot import of memories.json/index.json (and a pending memories.wal)
+    into a SQLite database. Safe to re-run: existing rows are replaced.
+    Returns the number of migrated memories.
+    """
+    data_dir = Path(data_dir)
+    layout = LAYOUT_SPLIT if (data_dir / "memories_meta.json").exists() else LAYOUT_INLINE
+    source = MemoryStore(data_dir, layout=layout)
+    target = SQLiteMemoryStore(db_path or data_dir / "memories.db")
+    try:
+        for _, memory in source.items():
+            target.put(memory)
+        for section, entries in source.index.items():
+            for key, value in entries.items():
+                if section not in INDEX_TABLES:
+                    target.index_set(section, key, value)
+                    continue
+                for memory_id in value:
+                    target.index_add(section, key, memory_id)
+        if not target.commit():
+            raise RuntimeError("Failed to commit migrated memories")
+        return len(source)
+    finally:
+        target.close()
+
+
+if __name__ == "__main__":
+    data_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path.home() / ".mneme_memory"
+    print(f"Migrating {data_dir} to SQLite...")
+    try:
+        count = migrate_json_to_sqlite(data_dir)
+    except Exception as e:
+        print(f"Error migrating memories: {e}")
+        sys.exit(1)
+    print(f"Migrated {count} memories to {data_dir / 'memories.db'}")